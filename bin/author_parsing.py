@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Author name parsing shared by metadata validation (author cleanup) and the GenBank authorset writer
+# Sheets and batches mostly repeat the same author lists, so each distinct author string and each distinct
+# full list is parsed once; cache_stats() reports the hit rates for the run summary.
+
+from collections import namedtuple
+from functools import lru_cache
+
+from nameparser import HumanName
+
+CACHE_SIZE = 4096
+
+# Leftovers of pandas reprs and separators that end up pasted into author cells
+UNWANTED_TOKENS = ['...', 'Name:', 'author', ',', 'dtype:', ':', 'object', '\\', '/']
+
+AuthorName = namedtuple("AuthorName", ["first", "middle", "last", "suffix", "title"])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_author(raw_name):
+	""" Cleans one author name, converting 'First Middle Last' to 'F.M. Last'
+		Returns None for names that are not in three parts.
+	"""
+	# Remove digits and leading/trailing whitespace
+	cleaned = ''.join([char for char in raw_name if not char.isdigit()]).strip()
+
+	# Remove unwanted tokens/characters
+	for token in UNWANTED_TOKENS:
+		cleaned = cleaned.replace(token, '')
+	parts = cleaned.split()
+
+	# Convert First Middle Last to F.M. Last
+	if len(parts) == 3 and len(parts[0]) > 1:
+		new_name = f"{parts[0][0]}.{parts[1][0]}. {parts[2]}"
+		return new_name if (new_name.count('.') == 2 and len(new_name.split()) == 2) else cleaned
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_author_list(raw_authors):
+	""" Cleans a ';'-separated author list and joins it back with '; '
+		Raises TypeError if one of the names cannot be cleaned.
+	"""
+	cleaned_authors = [clean_author(author.strip()) for author in raw_authors.split(';') if author.strip()]
+	return '; '.join(cleaned_authors)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_author(author):
+	""" Splits one author name into its parts with nameparser
+	"""
+	name = HumanName(author)
+	return AuthorName(name.first, name.middle, name.last, name.suffix, name.title)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_author_list(authors):
+	""" Parses a '; '-separated author list into a tuple of AuthorName
+	"""
+	return tuple(parse_author(author.strip()) for author in authors.split("; "))
+
+
+def cache_stats():
+	""" One summary line per author parsing cache that was used
+	"""
+	lines = []
+	for func in [clean_author, clean_author_list, parse_author, parse_author_list]:
+		info = func.cache_info()
+		calls = info.hits + info.misses
+		if calls:
+			lines.append(f"Author parsing cache {func.__name__}: {info.hits}/{calls} hits ({info.hits / calls:.0%}), {info.currsize} entries")
+	return lines
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Size-aware batch planning
+# Batches are capped on the number of samples and, optionally, on the bytes of sequence data the samples carry
+# (the FASTQ/FASTA/GFF files named in the metadata). Samples are placed first-fit in sheet order, so without a
+# byte limit the batches are the same consecutive slices a plain row split would give.
+
+import os
+import logging
+
+import numpy as np
+
+# Metadata columns naming files that get uploaded with a sample (the int_ names are the ones after validation)
+FILE_COLUMNS = ["illumina_sra_file_path_1", "illumina_sra_file_path_2", "nanopore_sra_file_path_1",
+				"int_illumina_sra_file_path_1", "int_illumina_sra_file_path_2", "int_nanopore_sra_file_path_1",
+				"fasta_path", "gff_path"]
+
+
+def sample_bytes(df, columns=None, root=None):
+	""" Array with the total size in bytes of the files each row names
+		Relative paths are taken from root (the pipeline's launch directory, like Nextflow's file()). Every distinct
+		path is stat'ed once; paths that cannot be stat'ed (missing, remote) count as 0 bytes.
+	"""
+	columns = [column for column in (columns or FILE_COLUMNS) if column in df.columns]
+	totals = np.zeros(len(df), dtype=np.int64)
+	sizes = {}
+	unreadable = []
+	for column in columns:
+		paths = df[column].astype(object).to_numpy()
+		for path in set(paths):
+			if path in sizes or not isinstance(path, str) or not path.strip():
+				continue
+			try:
+				sizes[path] = os.stat(os.path.join(root or "", path.strip())).st_size
+			except OSError:
+				sizes[path] = 0
+				unreadable.append(path)
+		totals += np.array([sizes.get(path, 0) if isinstance(path, str) else 0 for path in paths], dtype=np.int64)
+	if unreadable:
+		logging.warning(f"Could not stat {len(unreadable)} sequence file(s), they count as 0 bytes when batching (e.g. {unreadable[0]})")
+	return totals
+
+
+def plan_batches(sizes, max_samples, max_bytes=None):
+	""" Groups row positions into batches of at most max_samples rows and max_bytes bytes
+		Each row goes into the first batch it fits in, so rows keep their order within a batch and batches only
+		interleave when a large sample is pushed past smaller ones. A row larger than max_bytes gets a batch of
+		its own. Returns a list of (positions, planned_bytes).
+	"""
+	if max_samples < 1:
+		raise ValueError(f"Batch size must be at least 1, got {max_samples}")
+	batches = []  # [positions, planned_bytes]
+	open_batches = []  # indices into batches that can still take a sample
+	for position, size in enumerate(int(size) for size in sizes):
+		for n, i in enumerate(open_batches):
+			positions, planned = batches[i]
+			if not max_bytes or not positions or planned + size <= max_bytes:
+				break
+		else:
+			i = len(batches)
+			batches.append([[], 0])
+			open_batches.append(i)
+			n = len(open_batches) - 1
+			if max_bytes and size > max_bytes:
+				logging.warning(f"Sample at row {position + 1} has {size} bytes of sequence data, more than the batch limit of {max_bytes}")
+		batches[i][0].append(position)
+		batches[i][1] += size
+		if len(batches[i][0]) >= max_samples or (max_bytes and batches[i][1] >= max_bytes):
+			del open_batches[n]
+	return [(positions, planned) for positions, planned in batches]
+
+
+def batch_samples(entry):
+	""" Sample names of a batch_summary.json entry (a list in older summaries, a dict with the planned bytes now)
+	"""
+	return entry["samples"] if isinstance(entry, dict) else entry
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Streaming concatenation of the validated batch TSVs into one file
+# Batches normally share their header, so their data rows are copied as raw bytes in large buffered chunks without
+# parsing any cell. A batch whose columns differ is reconciled row by row onto the union of all headers (in order of
+# first appearance, missing cells left empty). Optionally a row-offset index records where every sample's row
+# starts in the output, so a row can be read back later with a single seek.
+
+import io
+import os
+import csv
+import sys
+import shutil
+import argparse
+import logging
+
+from submission_helper import setup_logging
+
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+
+# Matches pandas' to_csv(sep="\t"), which wrote the batch TSVs
+csv.field_size_limit(sys.maxsize)
+TSV_DIALECT = dict(delimiter="\t", quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+
+
+def get_args():
+	""" Expected args from user for concatenating batch TSVs
+	"""
+	parser = argparse.ArgumentParser(description="Concatenate batch TSVs into one TSV, reconciling their columns")
+	parser.add_argument("tsvs", nargs="+", help="Batch TSV files, concatenated in the given order")
+	parser.add_argument("--output", required=True, help="Path of the concatenated TSV")
+	parser.add_argument("--index", help="Also write a row-offset index (sample, offset, length) to this path")
+	parser.add_argument("--key_column", default="sample_name", help="Column that identifies rows in the index")
+	return parser
+
+
+def read_header(path):
+	""" Column names of a TSV (an empty list for an empty file) and the byte offset where its data rows start
+	"""
+	with open(path, "rb") as f:
+		line = f.readline()
+		names = next(csv.reader([line.decode().rstrip("\r\n")], **TSV_DIALECT), []) if line.strip() else []
+		return names, f.tell()
+
+
+def merge_headers(headers):
+	""" Union of the headers in order of first appearance; raises ValueError if a header repeats a column
+	"""
+	columns = {}
+	for path, names in headers.items():
+		if len(set(names)) != len(names):
+			duplicates = sorted({name for name in names if names.count(name) > 1})
+			raise ValueError(f"{path} repeats column(s) {', '.join(duplicates)}")
+		columns.update(dict.fromkeys(names))
+	return list(columns)
+
+
+def iter_records(f):
+	""" Yields the raw bytes of every record of a binary TSV stream; a quoted value may span lines
+	"""
+	pending = b""
+	for line in f:
+		pending += line
+		if pending.count(b'"') % 2 == 0:
+			yield pending
+			pending = b""
+	if pending:
+		yield pending
+
+
+def record_key(record, position):
+	""" Value of the column at position in a raw record
+	"""
+	if b'"' not in record:
+		fields = record.rstrip(b"\r\n").split(b"\t")
+		return fields[position].decode() if position < len(fields) else ""
+	fields = next(csv.reader([record.decode()], **TSV_DIALECT))
+	return fields[position] if position < len(fields) else ""
+
+
+class TsvConcatenator:
+	""" Writes the data rows of several TSVs under one merged header
+	"""
+	def __init__(self, paths, key_column="sample_name"):
+		self.paths = list(paths)
+		self.key_column = key_column
+		self.headers = {}
+		self.data_offsets = {}
+		for path in self.paths:
+			self.headers[path], self.data_offsets[path] = read_header(path)
+		self.columns = merge_headers(self.headers)
+		self.index = []  # (key, offset, length)
+
+	def write(self, output, build_index=False):
+		""" Writes the merged TSV; returns the number of rows reconciled (those from batches with other columns)
+		"""
+		reconciled = 0
+		with open(output, "wb") as out:
+			out.write(self.encode_row(self.columns))
+			for path in self.paths:
+				names = self.headers[path]
+				if not names:
+					logging.warning(f"Skipping {path}: it has no header")
+					continue
+				if names == self.columns:
+					self.copy_rows(path, out, build_index)
+				else:
+					missing = len(set(self.columns) - set(names))
+					logging.info(f"Reconciling {path} onto the merged header ({missing} missing column(s) left empty)")
+					reconciled += self.reconcile_rows(path, out, build_index)
+		return reconciled
+
+	@staticmethod
+	def encode_row(values):
+		""" One TSV line, quoted the way pandas writes it
+		"""
+		buffer = io.StringIO()
+		csv.writer(buffer, **TSV_DIALECT).writerow(values)
+		return buffer.getvalue().encode()
+
+	def copy_rows(self, path, out, build_index):
+		""" Appends the data rows of a TSV with the merged header as raw bytes
+		"""
+		with open(path, "rb") as f:
+			f.seek(self.data_offsets[path])
+			if not build_index:
+				shutil.copyfileobj(f, out, COPY_BUFFER_SIZE)
+				# Terminate the last row if the file did not end with a newline
+				if f.tell() > self.data_offsets[path]:
+					f.seek(-1, os.SEEK_END)
+					if f.read(1) != b"\n":
+						out.write(b"\n")
+				return
+			position = self.columns.index(self.key_column) if self.key_column in self.columns else None
+			for record in iter_records(f):
+				if not record.endswith(b"\n"):
+					record += b"\n"
+				if position is not None and record.strip():
+					self.index.append((record_key(record, position), out.tell(), len(record)))
+				out.write(record)
+
+	def reconcile_rows(self, path, out, build_index):
+		""" Appends the data rows of a TSV with other columns, reordered onto the merged header
+		"""
+		names = self.headers[path]
+		positions = {name: i for i, name in enumerate(names)}
+		rows = 0
+		with open(path, "r", newline="") as f:
+			f.readline()
+			for row in csv.reader(f, **TSV_DIALECT):
+				if not row:
+					continue
+				values = {column: row[i] if i < len(row) else "" for column, i in positions.items()}
+				record = self.encode_row([values.get(column, "") for column in self.columns])
+				if build_index and self.key_column in values:
+					self.index.append((values[self.key_column], out.tell(), len(record)))
+				out.write(record)
+				rows += 1
+		return rows
+
+	def write_index(self, path):
+		""" Writes the row-offset index as a TSV of key, byte offset and byte length
+		"""
+		with open(path, "w", newline="") as f:
+			writer = csv.writer(f, **TSV_DIALECT)
+			writer.writerow([self.key_column, "offset", "length"])
+			writer.writerows(self.index)
+
+
+def load_row_index(path):
+	""" Reads a row-offset index into {key: (offset, length)}
+	"""
+	with open(path, "r", newline="") as f:
+		reader = csv.reader(f, **TSV_DIALECT)
+		next(reader, None)
+		return {key: (int(offset), int(length)) for key, offset, length in reader}
+
+
+def read_row(tsv_path, offset, length):
+	""" Parses the single row stored at offset in a concatenated TSV
+	"""
+	with open(tsv_path, "rb") as f:
+		f.seek(offset)
+		record = f.read(length).decode()
+	return next(csv.reader([record], **TSV_DIALECT))
+
+
+def main():
+	args = get_args().parse_args()
+	setup_logging(log_file="concat_tsvs.log", level=logging.INFO)
+
+	concatenator = TsvConcatenator(args.tsvs, args.key_column)
+	reconciled = concatenator.write(args.output, build_index=bool(args.index))
+	if args.index:
+		concatenator.write_index(args.index)
+	logging.info(f"Concatenated {len(args.tsvs)} TSV(s) with {len(concatenator.columns)} column(s) into {args.output}"
+				 + (f", {reconciled} row(s) reconciled onto the merged header" if reconciled else ""))
+
+
+if __name__ == "__main__":
+	main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
-import pandas as pd
 import argparse
 import logging
-import math
+import json
+import os
 from submission_helper import setup_logging
+from metadata_loader import read_metadata_sheet
+from batch_planner import sample_bytes, plan_batches
 
 def get_args():
     """
@@ -16,24 +18,33 @@ def get_args():
     )
     parser.add_argument('--input', required=True, help="Path to the Excel file with accessions. The script will read row 2 as the header row, and rows 3: as data rows.")
     parser.add_argument('--batch_size', type=int, default=20, help="Max number of samples per batch")
+    parser.add_argument('--max_batch_bytes', type=int, default=0, help="Max bytes of sequence files (FASTA/GFF/FASTQ) per batch, 0 for no limit")
+    parser.add_argument('--path_root', help="Directory that relative sequence file paths are relative to (default: current directory)")
     parser.add_argument('--output_prefix', required=True, help="Prefix for output TSV files (e.g. '/path/to/batch')")
+    parser.add_argument('--compact', action='store_true', help="Store repetitive columns as categoricals to save memory")
+    parser.add_argument('--metadata_cache_dir', help="Directory for the cache of parsed metadata sheets (default: no cache)")
     return parser
 
 
-def write_batched_tsvs(df, batch_size, output_prefix):
+def write_batched_tsvs(df, batch_size, output_prefix, max_batch_bytes=0, path_root=None):
     """
-    Write DataFrame into batched TSV files, with at most `batch_size` rows each.
+    Write DataFrame into batched TSV files, with at most `batch_size` rows each
+    and, if max_batch_bytes is set, at most that many bytes of sequence files each.
+    The batches and their planned bytes are recorded in {output_prefix}_batch_summary.json.
     Returns a list of output file paths.
     """
     batched_paths = []
-    total_rows = len(df)
-    num_batches = math.ceil(total_rows / batch_size)
-    for i in range(num_batches):
-        batch_df = df.iloc[i * batch_size : (i + 1) * batch_size]
+    batch_log = {}
+    sizes = sample_bytes(df, root=path_root)
+    for i, (positions, planned_bytes) in enumerate(plan_batches(sizes, batch_size, max_batch_bytes)):
+        batch_df = df.iloc[positions]
         batch_path = f"{output_prefix}_batch_{i+1}.tsv"
         batch_df.to_csv(batch_path, sep='\t', index=False)
         batched_paths.append(batch_path)
-        logging.debug(f"Wrote {len(batch_df)} rows to {batch_path}")
+        batch_log[os.path.basename(batch_path)] = {"samples": batch_df["sample_name"].tolist(), "planned_bytes": planned_bytes}
+        logging.debug(f"Wrote {len(batch_df)} rows ({planned_bytes} bytes of sequence files) to {batch_path}")
+    with open(f"{output_prefix}_batch_summary.json", "w") as f:
+        json.dump(batch_log, f, indent=4)
     return batched_paths
 
 def main():
@@ -43,15 +54,19 @@ def main():
     setup_logging(log_file='create_batch_tsvs.log', level=logging.DEBUG)
 
     logging.info(f"Reading Excel file: {params['input']}")
-    df = pd.read_excel(params['input'], dtype=str, skiprows=1)
+    def drop_empty_rows(chunk):
+        # Drop completely empty rows (which can sneak in from Excel)
+        chunk = chunk.dropna(how='all')
+        # Optionally, drop rows with missing sample_name
+        if 'sample_name' in chunk.columns:
+            chunk = chunk[chunk['sample_name'].notna() & chunk['sample_name'].str.strip().ne("")]
+        return chunk
 
-    # Drop completely empty rows (which can sneak in from Excel)
-    df.dropna(how='all', inplace=True)
+    # Rows are filtered chunk by chunk as the sheet is streamed in
+    df, _ = read_metadata_sheet(params['input'], header_row=1, na_filter=True, on_chunk=drop_empty_rows,
+                                cache_dir=params['metadata_cache_dir'], compact=params['compact'])
 
-    # Optionally, drop rows with missing sample_name
-    if 'sample_name' in df.columns:
-        df = df[df['sample_name'].notna() & df['sample_name'].str.strip().ne("")]
-    else:
+    if 'sample_name' not in df.columns:
         logging.error("Missing required column: sample_name")
         return
     
@@ -62,7 +77,8 @@ def main():
         return
 
     logging.info(f"Read {len(df)} rows. Splitting into batches of {params['batch_size']}")
-    output_paths = write_batched_tsvs(df, params['batch_size'], params['output_prefix'])
+    output_paths = write_batched_tsvs(df, params['batch_size'], params['output_prefix'],
+                                      params['max_batch_bytes'], params['path_root'])
 
     logging.info(f"Wrote {len(output_paths)} batched TSV files:")
     for path in output_paths:
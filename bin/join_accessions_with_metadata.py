@@ -4,6 +4,7 @@ import argparse
 import logging
 import pandas as pd
 from submission_helper import setup_logging  # assuming you already have this helper
+from metadata_loader import compact_frame
 
 def get_args():
     """Expected args from user for fetching reports"""
@@ -13,15 +14,20 @@ def get_args():
     parser.add_argument('--metadata_tsv', required=True, help="Path to TSV metadata file with data for all samples")
     parser.add_argument('--submission_report', required=True, help="Path to submission_report.csv")
     parser.add_argument('--output', required=True, help="Path to final Excel file to write")
+    parser.add_argument('--compact', action='store_true', help="Store repetitive metadata columns as categoricals to save memory")
     return parser
 
-def read_and_clean(path, sep=None):
+def read_and_clean(path, sep=None, compact=False):
     """
     Reads a CSV/TSV and removes repeated header rows.
     Automatically detects if rows are exact duplicates of the header row.
+    With compact=True, low-cardinality columns are stored as categoricals.
     """
     df = pd.read_csv(path, sep=sep, dtype=str, skip_blank_lines=True)
     df = df[~df.eq(df.columns).all(axis=1)]  # Drop repeated header rows
+    if compact:
+        df = df.copy()
+        compact_frame(df)
     return df
 
 def log_missing_accessions(df, logger):
@@ -45,7 +51,7 @@ def main():
     logger = logging.getLogger()
 
     # Load metadata TSV and submission report CSV, and clean both
-    metadata_df = read_and_clean(params["metadata_tsv"], sep='\t')
+    metadata_df = read_and_clean(params["metadata_tsv"], sep='\t', compact=params['compact'])
     report_df = read_and_clean(params["submission_report"], sep=',')
 
     # Normalize casing and strip whitespace on join keys
@@ -12,16 +12,20 @@ import re
 import argparse
 import sys
 import shutil
+import logging
 
 # import utility functions 
 from annotation_utility import MainUtility as main_util
 from annotation_utility import GFFChecksUtility as gff_checks_util
+from metadata_loader import read_metadata_sheet
 
 
 def annotation_main():
 	""" Main function for calling the annotation transfer pipeline
 	"""
 	warnings.filterwarnings('ignore')
+	# INFO level so the metadata loader's summary (rows read, peak RSS) reaches the output
+	logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s", stream=sys.stdout)
 	
 	# get all parameters needed for running the steps
 	parameters_class = GetParams()
@@ -229,7 +233,7 @@ class AnnotationPrep:
 	def load_meta(self):
 		""" Imports the Excel file and puts it into a dataframe
 		"""
-		self.meta_df = pd.read_excel(self.parameters['meta_path'], header=[1], sheet_name=0)
+		self.meta_df, _ = read_metadata_sheet(self.parameters['meta_path'], header_row=1, na_filter=True)
 		df = self.meta_df.set_index("sample_name", drop=False)
 		self.sample_list = df.loc[:, "sample_name"]
 
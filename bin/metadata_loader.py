@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+# Streaming reader for the metadata Excel sheets
+# Rows come out of openpyxl's read-only mode one at a time and are packed into fixed-size dataframe chunks,
+# so the workbook is never held in memory as a whole. Cells are converted the same way
+# pd.read_excel(dtype=str) converts them, so the resulting dataframe matches what pandas would load.
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import resource
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+# pyarrow is only needed for the on-disk cache of parsed sheets
+try:
+	import pyarrow as pa
+	from pyarrow import feather
+except ImportError:
+	pa = None
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_METADATA_KEY = "tostadas_metadata_reader"
+# Bump when the parsing or the cache layout changes so old entries stop matching
+CACHE_VERSION = 1
+# In compact mode, string columns with at most this share of distinct values are stored as categoricals
+COMPACT_MAX_UNIQUE_RATIO = 0.5
+
+# Strings that pandas reads as NaN by default (used when na_filter is on)
+NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+			 "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+def peak_rss_mb():
+	""" Peak resident set size of this process in MB
+	"""
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+	return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def convert_cell(cell):
+	""" Converts an openpyxl cell to the string pandas would give it with dtype=str
+	"""
+	value = cell.value
+	if value is None:
+		return ""
+	if cell.data_type == TYPE_ERROR:
+		return np.nan
+	if cell.data_type == TYPE_NUMERIC and isinstance(value, (int, float)):
+		# Whole numbers are stored as floats in Excel; pandas turns them back into ints
+		if int(value) == value:
+			return str(int(value))
+		return str(float(value))
+	return str(value)
+
+
+def dedup_names(names):
+	""" Renames repeated column names to name.1, name.2, ... like pandas does
+	"""
+	deduped = list(names)
+	counts = defaultdict(int)
+	for i, base in enumerate(names):
+		name, count = base, counts[base]
+		while count > 0:
+			counts[base] = count + 1
+			name = f"{base}.{count}"
+			# Skip suffixes that are already taken by another column
+			count = count + 1 if name in names else counts[name]
+		deduped[i] = name
+		counts[name] = count + 1
+	return deduped
+
+
+def compact_frame(df, columns=None, max_unique_ratio=COMPACT_MAX_UNIQUE_RATIO):
+	""" Stores the low-cardinality string columns of df as categoricals (in place) and returns their names
+		Free-text columns (sample names, descriptions, paths) stay plain strings. columns: convert exactly
+		these instead of choosing by cardinality (used to keep the chunks of one sheet consistent).
+	"""
+	converted = []
+	if not df.columns.is_unique:
+		return converted
+	for column in df.columns:
+		values = df[column]
+		if values.dtype != object:
+			continue
+		if columns is None:
+			if pd.api.types.infer_dtype(values, skipna=True) not in ("string", "empty"):
+				continue
+			if values.nunique() > max(1, len(values) * max_unique_ratio):
+				continue
+		elif column not in columns:
+			continue
+		df[column] = values.astype("category")
+		converted.append(column)
+	return converted
+
+
+def concat_compact(frames):
+	""" pd.concat that keeps categorical columns categorical although each chunk has its own categories
+	"""
+	for column in frames[0].columns[frames[0].dtypes == "category"]:
+		if not all(column in frame.columns and frame[column].dtype == "category" for frame in frames):
+			continue
+		categories = pd.Index(pd.unique(np.concatenate([frame[column].cat.categories.to_numpy(dtype=object) for frame in frames])))
+		for frame in frames:
+			frame[column] = frame[column].cat.set_categories(categories)
+	return pd.concat(frames)
+
+
+def blank_sample_rows(df):
+	""" Row labels whose sample_name is missing or blank
+	"""
+	if 'sample_name' not in df.columns:
+		return []
+	names = df['sample_name']
+	return df.index[names.isna() | (names.astype(str).str.strip() == "")].tolist()
+
+
+class ExcelMetadataReader:
+	""" Reads a metadata sheet in chunks of chunk_size rows
+
+		header_row: 0-based row holding the column names, rows above it are skipped
+		na_filter: if True, empty cells and the usual NA strings become NaN, otherwise they stay as ""
+		compact: store low-cardinality string columns as categoricals (see compact_frame) chunk by chunk
+
+		While reading, the reader records the column names that appear more than once in the header
+		(duplicate_columns) and the row labels with an empty sample_name (blank_sample_rows).
+	"""
+	def __init__(self, path, header_row=1, chunk_size=DEFAULT_CHUNK_SIZE, na_filter=False, sheet_name=0, compact=False):
+		self.path = path
+		self.header_row = header_row
+		self.chunk_size = chunk_size
+		self.na_filter = na_filter
+		self.sheet_name = sheet_name
+		self.compact = compact
+		self.header = []
+		self.columns = []
+		self.duplicate_columns = []
+		self.blank_sample_rows = []
+		self.n_rows = 0
+		self.n_chunks = 0
+
+	def _set_columns(self, width):
+		names = [name if name != "" else f"Unnamed: {i}" for i, name in enumerate(self.header)]
+		names += [f"Unnamed: {i}" for i in range(len(names), width)]
+		self.columns = dedup_names(names)
+
+	def _make_chunk(self, rows):
+		width = len(self.columns)
+		chunk = pd.DataFrame([row + [""] * (width - len(row)) for row in rows], columns=self.columns, dtype=object,
+							 index=pd.RangeIndex(self.n_rows, self.n_rows + len(rows)))
+		if self.na_filter:
+			chunk = chunk.mask(chunk.isin(NA_VALUES))
+		self.blank_sample_rows.extend(blank_sample_rows(chunk))
+		self.n_rows += len(rows)
+		self.n_chunks += 1
+		return chunk
+
+	def chunks(self):
+		""" Yields the data rows as dataframes of at most chunk_size rows, indexed by data row number
+			A row wider than the header adds 'Unnamed: i' columns from that chunk onwards.
+		"""
+		workbook = load_workbook(self.path, read_only=True, data_only=True, keep_links=False)
+		try:
+			if isinstance(self.sheet_name, int):
+				sheet = workbook.worksheets[self.sheet_name]
+			else:
+				sheet = workbook[self.sheet_name]
+			sheet.reset_dimensions()
+
+			width = 0
+			buffer, blank_rows = [], []
+			for row_number, cells in enumerate(sheet.iter_rows()):
+				row = [convert_cell(cell) for cell in cells]
+				# Drop trailing empty cells, the sheet width is the widest row
+				while row and row[-1] == "":
+					row.pop()
+				width = max(width, len(row))
+
+				if row_number < self.header_row:
+					continue
+				if row_number == self.header_row:
+					self.header = row
+					counts = defaultdict(int)
+					for name in row:
+						if name != "":
+							counts[name] += 1
+					self.duplicate_columns = [name for name, count in counts.items() if count > 1]
+					self._set_columns(width)
+					continue
+
+				if width > len(self.columns):
+					self._set_columns(width)
+				if not row:
+					# Hold blank rows back until a row with data follows, trailing blank rows are dropped
+					blank_rows.append(row)
+					continue
+				buffer.extend(blank_rows)
+				blank_rows = []
+				buffer.append(row)
+				while len(buffer) >= self.chunk_size:
+					yield self._make_chunk(buffer[:self.chunk_size])
+					buffer = buffer[self.chunk_size:]
+
+			if not self.columns and width:
+				self._set_columns(width)
+			if buffer:
+				yield self._make_chunk(buffer)
+		finally:
+			workbook.close()
+
+	def read(self, on_chunk=None, cache=None):
+		""" Reads the whole sheet into one dataframe
+			on_chunk is called with each chunk as it is read; if it returns a dataframe, that replaces the chunk
+			(e.g. to drop rows early). The peak RSS is logged once the sheet is read.
+			cache: optional MetadataCache; a warm entry skips the Excel parsing and on_chunk sees the whole sheet as one chunk
+		"""
+		key = cache.key(self.path, self.options()) if cache is not None else None
+		if key is not None:
+			cached = cache.load(key)
+			if cached is not None:
+				df, info = cached
+				self.header, self.columns, self.duplicate_columns = info['header'], info['columns'], info['duplicate_columns']
+				self.blank_sample_rows = blank_sample_rows(df)
+				self.n_rows = len(df)
+				if on_chunk is not None:
+					result = on_chunk(df)
+					if result is not None:
+						df = result
+				if self.compact:
+					compact_frame(df)
+				logging.info(f"Loaded {self.n_rows} rows x {len(self.columns)} columns for {self.path} "
+							 f"from the metadata cache, peak RSS {peak_rss_mb():.1f} MB")
+				return df
+
+		empty_value = np.nan if self.na_filter else ""
+		frames = []
+		writer = None
+		compact_columns = None  # chosen on the first chunk
+		for chunk in self.chunks():
+			# The raw chunks are written to the cache as they stream past
+			if key is not None and writer is None:
+				writer = cache.writer(key, self.columns, {
+					'header': self.header,
+					'columns': self.columns,
+					'duplicate_columns': self.duplicate_columns
+				})
+			if writer is not None:
+				writer.write(chunk)
+			if on_chunk is not None:
+				result = on_chunk(chunk)
+				if result is not None:
+					chunk = result
+			if self.compact:
+				compact_columns = compact_frame(chunk, columns=compact_columns)
+			frames.append(chunk)
+
+		if writer is not None:
+			writer.close()
+
+		if frames:
+			# Columns added part way through the sheet are empty in the earlier chunks
+			frames = [frame if len(frame.columns) == len(self.columns) else frame.reindex(columns=self.columns, fill_value=empty_value)
+					  for frame in frames]
+			df = concat_compact(frames) if self.compact else pd.concat(frames)
+		else:
+			df = pd.DataFrame(columns=self.columns, dtype=object)
+
+		logging.info(f"Read {self.n_rows} rows x {len(self.columns)} columns from {self.path} "
+					 f"in {self.n_chunks} chunk(s), peak RSS {peak_rss_mb():.1f} MB")
+		return df
+
+	def options(self):
+		""" Reader settings that change the parsed frame (part of the cache key)
+		"""
+		return {'header_row': self.header_row, 'na_filter': self.na_filter, 'sheet_name': self.sheet_name}
+
+
+def file_sha256(path, block_size=1024 * 1024):
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(block_size), b''):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+class MetadataCache:
+	""" Content-addressed cache of parsed metadata sheets, stored as Feather (Arrow IPC) files
+
+		Entries are keyed by the SHA-256 of the workbook bytes plus the reader options. The directory is
+		kept under max_bytes by evicting the least recently used entries (a cache hit refreshes its mtime).
+	"""
+	def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+
+	@classmethod
+	def in_dir(cls, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+		""" Cache in cache_dir, or None if no directory is given or pyarrow is not installed
+		"""
+		if not cache_dir:
+			return None
+		if pa is None:
+			logging.info("pyarrow is not installed, the metadata cache is disabled")
+			return None
+		return cls(os.path.abspath(cache_dir), max_bytes)
+
+	def key(self, path, options):
+		try:
+			content = file_sha256(path)
+		except OSError as e:
+			logging.warning(f"Could not hash {path} for the metadata cache: {e}")
+			return None
+		settings = json.dumps(options, sort_keys=True)
+		return hashlib.sha256(f"{CACHE_VERSION}:{content}:{settings}".encode()).hexdigest()
+
+	def entry_path(self, key):
+		return os.path.join(self.cache_dir, f"{key}.feather")
+
+	def load(self, key):
+		""" Returns (dataframe, reader info) for a warm entry, or None
+		"""
+		path = self.entry_path(key)
+		if not os.path.exists(path):
+			return None
+		try:
+			table = feather.read_table(path, memory_map=True)
+			info = json.loads(table.schema.metadata[CACHE_METADATA_KEY.encode()])
+			os.utime(path)
+		except (OSError, KeyError, ValueError, pa.ArrowInvalid) as e:
+			logging.warning(f"Ignoring unreadable metadata cache entry {path}: {e}")
+			return None
+		df = table.to_pandas()
+		# Arrow hands back None for missing values, the Excel reader gives NaN
+		df = df.astype(object).where(df.notna(), np.nan)
+		return df, info
+
+	def writer(self, key, columns, info):
+		try:
+			os.makedirs(self.cache_dir, exist_ok=True)
+			return CacheWriter(self, key, columns, info)
+		except (OSError, pa.ArrowException) as e:
+			logging.warning(f"Metadata cache directory {self.cache_dir} is not writable, skipping the cache: {e}")
+			return None
+
+	def evict(self):
+		""" Removes the least recently used entries until the cache fits in max_bytes
+		"""
+		entries = []
+		for name in os.listdir(self.cache_dir):
+			if name.endswith('.feather'):
+				stat = os.stat(os.path.join(self.cache_dir, name))
+				entries.append((stat.st_mtime, stat.st_size, name))
+		total = sum(size for _, size, _ in entries)
+		for _, size, name in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			os.remove(os.path.join(self.cache_dir, name))
+			total -= size
+			logging.info(f"Evicted {name} from the metadata cache")
+
+
+class CacheWriter:
+	""" Streams dataframe chunks into a cache entry; the entry only appears once close() succeeds
+	"""
+	def __init__(self, cache, key, columns, info):
+		self.cache = cache
+		self.path = cache.entry_path(key)
+		self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+		self.columns = list(columns)
+		# Reader info rides along in the schema metadata
+		self.schema = pa.schema([(column, pa.string()) for column in self.columns],
+								metadata={CACHE_METADATA_KEY: json.dumps(info)})
+		self.writer = pa.ipc.new_file(self.tmp_path, self.schema)
+
+	def write(self, chunk):
+		if self.writer is None:
+			return
+		if list(chunk.columns) != self.columns:
+			# The sheet grew extra columns part way through, the fixed schema no longer fits
+			self.abort()
+			return
+		try:
+			self.writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=self.schema, preserve_index=False))
+		except (OSError, pa.ArrowException) as e:
+			logging.warning(f"Could not write the metadata cache entry: {e}")
+			self.abort()
+
+	def close(self):
+		if self.writer is None:
+			return
+		try:
+			self.writer.close()
+			os.replace(self.tmp_path, self.path)
+			self.cache.evict()
+		except (OSError, pa.ArrowException) as e:
+			logging.warning(f"Could not write the metadata cache entry: {e}")
+			self.abort()
+
+	def abort(self):
+		if self.writer is not None:
+			try:
+				self.writer.close()
+			except (OSError, pa.ArrowException):
+				pass
+			self.writer = None
+		if os.path.exists(self.tmp_path):
+			os.remove(self.tmp_path)
+
+
+def read_metadata_sheet(path, header_row=1, na_filter=False, on_chunk=None, cache_dir=None, compact=False):
+	""" Loads a metadata sheet through the streaming reader, and the on-disk cache in cache_dir if one is given
+		Returns the dataframe and the reader (for duplicate_columns / blank_sample_rows)
+	"""
+	reader = ExcelMetadataReader(path, header_row=header_row, na_filter=na_filter, compact=compact)
+	cache = MetadataCache.in_dir(cache_dir)
+	df = reader.read(on_chunk=on_chunk, cache=cache)
+	return df, reader
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Compiled BioSample package schema
+# The biosample_fields_key YAML lists the required fields of every BioSample package and the metadata columns used
+# by validation (standard template columns) and by the BioSample XML (attribute columns). It is parsed once per
+# process and compiled into frozen sets and column positions, so every sample of a batch looks columns up with set
+# intersections instead of scanning lists.
+
+import os
+import logging
+from functools import lru_cache
+
+import yaml
+
+DEFAULT_FIELDS_KEY = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "assets", "biosample_fields_key.yaml")
+# Column roles every key needs: standard template columns and the BioSample / wastewater attributes
+COLUMN_ROLES = ("static", "biosample_attributes", "wastewater_attributes")
+
+
+class PackageSchema:
+	""" Required fields per BioSample package and the column sets used by validation and XML generation
+
+		packages: {package: {'required': [...], 'at_least_one_required': [[...], ...]}}
+		columns: {role: [...]}, e.g. 'static', 'biosample_attributes', 'wastewater_attributes'
+	"""
+	def __init__(self, packages, columns):
+		self.packages = packages
+		self.columns = columns
+		self.required = {name: tuple(fields.get('required') or []) for name, fields in packages.items()}
+		self.at_least_one_required = {name: tuple(tuple(group) for group in fields.get('at_least_one_required') or [])
+									  for name, fields in packages.items()}
+		# Every field a package names, for membership tests
+		self.package_fields = {name: frozenset(self.required[name]).union(*self.at_least_one_required[name])
+							   for name in packages}
+		self.column_sets = {role: frozenset(names) for role, names in columns.items()}
+		self.column_positions = {role: {name: i for i, name in enumerate(dict.fromkeys(names))}
+								 for role, names in columns.items()}
+
+	@classmethod
+	def from_yaml(cls, path):
+		fields_dict = read_fields_key(path)
+		columns = fields_dict.get("Metadata_columns") or {}
+		# Keys written before the Metadata_columns section existed only list packages; their columns are the bundled ones
+		missing = [role for role in COLUMN_ROLES if role not in columns]
+		if missing and os.path.realpath(path) != os.path.realpath(DEFAULT_FIELDS_KEY):
+			logging.warning(f"{path} has no Metadata_columns for {', '.join(missing)}, using the ones in {DEFAULT_FIELDS_KEY}")
+			default_columns = read_fields_key(DEFAULT_FIELDS_KEY).get("Metadata_columns") or {}
+			columns = {**columns, **{role: default_columns[role] for role in missing if role in default_columns}}
+		return cls(fields_dict.get("BioSample_packages", {}), columns)
+
+	def role_columns(self, role):
+		""" Set of the columns for a role (empty if the YAML has none)
+		"""
+		return self.column_sets.get(role, frozenset())
+
+	@lru_cache(maxsize=64)
+	def available(self, role, columns):
+		""" Columns of a role present in columns (a tuple, e.g. tuple(df.columns)), in the role's order
+			Samples of a batch share their columns, so this is computed once per batch and role.
+		"""
+		positions = self.column_positions.get(role, {})
+		return tuple(sorted(positions.keys() & set(columns), key=positions.__getitem__))
+
+
+def read_fields_key(path):
+	with open(path, "r") as f:
+		return yaml.load(f, Loader=yaml.SafeLoader) or {}
+
+
+@lru_cache(maxsize=None)
+def load_package_schema(path=None):
+	""" Returns the compiled schema for a biosample_fields_key YAML (the bundled one by default), once per process
+	"""
+	return PackageSchema.from_yaml(path or DEFAULT_FIELDS_KEY)
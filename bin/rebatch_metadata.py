@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Splits the validated metadata of all samples back into the batches of an earlier submission
+# The full TSV is streamed once and every row is routed to its batch through a sample -> batch dict built from
+# batch_summary.json, so the cost is one pass over the rows whatever the number of batches. Each batch gets its
+# TSV and the meta JSON the update workflow reads. On request (--sample_index), the sample -> batch mapping is also
+# kept as a sorted index file that later steps can memory-map and search without loading it.
+
+import os
+import csv
+import sys
+import json
+import mmap
+import argparse
+import logging
+
+from submission_helper import setup_logging
+from batch_planner import batch_samples
+
+# Matches pandas' to_csv(sep="\t"), which wrote the batch TSVs
+csv.field_size_limit(sys.maxsize)
+TSV_DIALECT = dict(delimiter="\t", quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+
+
+def get_args():
+	""" Expected args from user for rebatching the validated metadata
+	"""
+	parser = argparse.ArgumentParser(description="Split the validated metadata TSV into the batches of batch_summary.json")
+	parser.add_argument("--full_tsv", required=True, help="Validated metadata TSV with all samples")
+	parser.add_argument("--batch_summary", required=True, help="batch_summary.json of the original validation run")
+	parser.add_argument("--outdir", default=".", help="Directory for the batch TSVs and meta JSONs")
+	parser.add_argument("--sample_index", help="Also write the sample -> batch index to this file (e.g. sample_batch_index.idx)")
+	parser.add_argument("--biosample", action="store_true", help="Enable BioSample for every batch")
+	parser.add_argument("--sra", action="store_true", help="Enable SRA for every batch")
+	parser.add_argument("--genbank", action="store_true", help="Enable GenBank for every batch")
+	return parser
+
+
+def load_sample_batches(summary_path):
+	""" Returns ({sample: batch_id}, {batch_id: [samples]}) from a batch_summary.json, in the summary's order
+	"""
+	with open(summary_path, "r") as f:
+		summary = json.load(f)
+	sample_to_batch = {}
+	batches = {}
+	for batch_file, entry in summary.items():
+		batch_id = os.path.splitext(batch_file)[0]
+		batches[batch_id] = batch_samples(entry)
+		for sample in batches[batch_id]:
+			if sample in sample_to_batch:
+				logging.warning(f"Sample {sample} is listed in {sample_to_batch[sample]} and {batch_id}, keeping it in {batch_id}")
+			sample_to_batch[sample] = batch_id
+	return sample_to_batch, batches
+
+
+def rebatch(full_tsv, sample_to_batch, batches, outdir="."):
+	""" Streams full_tsv once and writes <batch_id>.tsv for every batch; returns the rows written per batch
+		Every batch file gets the header, even if none of its samples are in full_tsv.
+	"""
+	files = {}
+	writers = {}
+	written = dict.fromkeys(batches, 0)
+	unbatched = 0
+	try:
+		with open(full_tsv, "r", newline="") as f:
+			reader = csv.reader(f, **TSV_DIALECT)
+			header = next(reader)
+			if "sample_name" not in header:
+				raise ValueError(f"{full_tsv} has no sample_name column")
+			sample_column = header.index("sample_name")
+			for batch_id in batches:
+				files[batch_id] = open(os.path.join(outdir, f"{batch_id}.tsv"), "w", newline="")
+				writers[batch_id] = csv.writer(files[batch_id], **TSV_DIALECT)
+				writers[batch_id].writerow(header)
+			for row in reader:
+				batch_id = sample_to_batch.get(row[sample_column]) if len(row) > sample_column else None
+				if batch_id is None:
+					unbatched += 1
+					continue
+				writers[batch_id].writerow(row)
+				written[batch_id] += 1
+	finally:
+		for handle in files.values():
+			handle.close()
+	if unbatched:
+		logging.warning(f"{unbatched} row(s) of {full_tsv} belong to no batch of the summary and were skipped")
+	return written
+
+
+def write_batch_meta(batches, enabled, outdir="."):
+	""" Writes <batch_id>.json with the meta, samples and enabled databases UPDATE_SUBMISSION takes
+	"""
+	for batch_id, samples in batches.items():
+		meta = {"batch_id": batch_id, "batch_tsv": f"{batch_id}.tsv"}
+		with open(os.path.join(outdir, f"{batch_id}.json"), "w") as f:
+			json.dump({"meta": meta, "samples": [{"sample_id": sample} for sample in samples], "enabled": enabled}, f)
+
+
+def write_sample_index(sample_to_batch, path):
+	""" Writes the sample -> batch mapping as 'sample<TAB>batch_id' lines sorted by the UTF-8 bytes of the sample
+	"""
+	lines = sorted(f"{sample}\t{batch_id}\n".encode() for sample, batch_id in sample_to_batch.items())
+	with open(path, "wb") as f:
+		f.writelines(lines)
+
+
+class SampleBatchIndex:
+	""" Read-only view of a sample index file; lookups binary-search the memory-mapped file
+		Usable as a context manager. Sample names cannot contain tabs or newlines (they are TSV values).
+	"""
+	def __init__(self, path):
+		self.file = open(path, "rb")
+		size = os.fstat(self.file.fileno()).st_size
+		self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		if isinstance(self.map, mmap.mmap):
+			self.map.close()
+		self.file.close()
+
+	def _line_start(self, position):
+		""" Offset of the line that contains position
+		"""
+		return self.map.rfind(b"\n", 0, position) + 1
+
+	def get(self, sample, default=None):
+		""" Batch id of sample, or default if the index does not list it
+		"""
+		key = sample.encode() + b"\t"
+		low, high = 0, len(self.map)
+		while low < high:
+			start = self._line_start((low + high) // 2)
+			end = self.map.find(b"\n", start)
+			end = len(self.map) if end == -1 else end
+			line = self.map[start:end]
+			if line.startswith(key):
+				return line[len(key):].decode()
+			if line < key:  # lines sort like their 'sample<TAB>' prefixes
+				low = end + 1
+			else:
+				high = start
+		return default
+
+	def __contains__(self, sample):
+		return self.get(sample) is not None
+
+
+def main():
+	args = get_args().parse_args()
+	os.makedirs(args.outdir, exist_ok=True)
+	setup_logging(log_file=os.path.join(args.outdir, "rebatch_metadata.log"), level=logging.INFO)
+
+	enabled = [database for database in ("biosample", "sra", "genbank") if getattr(args, database)]
+	sample_to_batch, batches = load_sample_batches(args.batch_summary)
+	written = rebatch(args.full_tsv, sample_to_batch, batches, args.outdir)
+	for batch_id, samples in batches.items():
+		if written[batch_id] < len(samples):
+			logging.warning(f"{batch_id}: {len(samples) - written[batch_id]} of {len(samples)} sample(s) were not found in {args.full_tsv}")
+	write_batch_meta(batches, enabled, args.outdir)
+	if args.sample_index:
+		write_sample_index(sample_to_batch, args.sample_index)
+	logging.info(f"Wrote {len(batches)} batch(es) with {sum(written.values())} sample(s), enabled databases: {', '.join(enabled) or 'none'}")
+
+
+if __name__ == "__main__":
+	main()
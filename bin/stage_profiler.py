@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Per-stage timing and memory instrumentation for the validation script (--profile)
+# Each stage records wall time, CPU time (including finished worker processes), the peak memory allocated during
+# the stage (tracemalloc) and the process peak RSS so far. Optionally each stage is also run under cProfile and
+# dumped to <dump_dir>/<stage>.prof for snakeviz/pstats.
+
+import os
+import json
+import time
+import cProfile
+import resource
+import tracemalloc
+from contextlib import contextmanager
+
+from metadata_loader import peak_rss_mb
+
+
+def cpu_seconds():
+	""" CPU time of this process plus its reaped child processes
+	"""
+	own = resource.getrusage(resource.RUSAGE_SELF)
+	children = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class StageProfiler:
+	""" Collects measurements for named stages; a disabled profiler makes stage() a no-op
+		Stages should not be nested, since tracemalloc has a single peak counter.
+	"""
+	def __init__(self, enabled=False, dump_dir=None):
+		self.enabled = enabled or dump_dir is not None
+		self.dump_dir = dump_dir
+		self.stages = []
+		self.start = time.perf_counter()
+		if self.enabled and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		if self.dump_dir:
+			os.makedirs(self.dump_dir, exist_ok=True)
+
+	@contextmanager
+	def stage(self, name):
+		if not self.enabled:
+			yield
+			return
+		profile = cProfile.Profile() if self.dump_dir else None
+		tracemalloc.reset_peak()
+		start_memory = tracemalloc.get_traced_memory()[0]
+		start_wall, start_cpu = time.perf_counter(), cpu_seconds()
+		if profile is not None:
+			profile.enable()
+		try:
+			yield
+		finally:
+			if profile is not None:
+				profile.disable()
+				profile.dump_stats(os.path.join(self.dump_dir, f"{len(self.stages) + 1:02d}_{name}.prof"))
+			current, peak = tracemalloc.get_traced_memory()
+			self.stages.append({
+				"stage": name,
+				"wall_s": round(time.perf_counter() - start_wall, 6),
+				"cpu_s": round(cpu_seconds() - start_cpu, 6),
+				"peak_alloc_mb": round((peak - start_memory) / (1024 * 1024), 3),
+				"net_alloc_mb": round((current - start_memory) / (1024 * 1024), 3),
+				"peak_rss_mb": round(peak_rss_mb(), 1)
+			})
+
+	def write(self, path):
+		""" Writes the recorded stages and the totals to a JSON file
+		"""
+		if not self.enabled:
+			return
+		timings = {
+			"stages": self.stages,
+			"total": {
+				"wall_s": round(time.perf_counter() - self.start, 6),
+				"stage_wall_s": round(sum(stage["wall_s"] for stage in self.stages), 6),
+				"cpu_s": round(cpu_seconds(), 6),
+				"peak_rss_mb": round(peak_rss_mb(), 1)
+			}
+		}
+		with open(path, "w") as f:
+			json.dump(timings, f, indent=4)
@@ -7,9 +7,12 @@ from submission_helper import (
 	SubmissionConfigParser,
 	FTPClient,
 	SFTPClient,
+	TransferJournal,
+	UploadManifest,
 	setup_logging,
 	sendemail
 )
+from upload_scheduler import UploadScheduler
 
 def get_args():
 	""" Expected args from user and default values associated with them
@@ -33,12 +36,30 @@ def get_args():
 				   help="Whether to send the ASN.1 file after running table2asn", action="store_const", default=False, const=True)
 	parser.add_argument("--dry_run", action="store_true", 
 				   help="Print what would be uploaded but don't connect or transfer files")
+	parser.add_argument("--upload_streams", type=int, default=4,
+				   help="Number of concurrent FTP/SFTP sessions used to upload files")
+	parser.add_argument("--checksum", action="store_true",
+				   help="Also compare MD5 checksums before skipping files recorded in the upload manifest")
 	return parser
 
 def is_fastq_file(filename):
     fastq_exts = ('.fq', '.fq.gz', '.fastq', '.fastq.gz')
     return filename.lower().endswith(fastq_exts)
 
+def delete_uploaded_fastqs(dirpath, files_to_upload):
+	for fname in files_to_upload:
+		if not is_fastq_file(fname):
+			continue
+		local = os.path.join(dirpath, fname)
+		try:
+			if os.path.islink(local):
+				os.remove(local)
+				logging.info(f"Deleted symlinked FASTQ file after upload: {local}")
+			else:
+				logging.warning(f"FASTQ file {local} is not a symlink - skipping deletion for safety")
+		except Exception as e:
+			logging.warning(f"Could not delete FASTQ file {local}: {e}")
+
 def main_submit():
 	args = get_args().parse_args()
 	params = vars(args)
@@ -47,7 +68,18 @@ def main_submit():
 
 	# load parameters and credentials
 	config = SubmissionConfigParser(params).load_config()
-	client = SFTPClient(config) if params['submission_mode']=='sftp' else FTPClient(config)
+	client_class = SFTPClient if params['submission_mode']=='sftp' else FTPClient
+	# Remote sizes of unfinished uploads, so a retry or a re-run only sends the missing bytes
+	journal = TransferJournal(os.path.join(params['submission_folder'], 'transfer_journal.json'))
+	# Files already sent by an earlier run, skipped if the server still has them in full
+	manifest = UploadManifest(os.path.join(params['submission_folder'], 'upload_manifest.json'), checksum=params['checksum'])
+	# Every stream keeps one login for the whole run, shared by all the submission directories it uploads to
+	scheduler = UploadScheduler(lambda: client_class(config, journal), params['upload_streams'], manifest,
+								metrics_path=os.path.join(params['submission_folder'], 'transfer_metrics.json'))
+	submit_folder(params, config, scheduler)
+	scheduler.run()
+
+def submit_folder(params, config, scheduler):
 	root = params['submission_folder']
 	mode = 'Test' if params['test'] else 'Production'
 
@@ -109,22 +141,9 @@ def main_submit():
 					local = os.path.join(dirpath, fname)
 					logging.info(f"[DRY-RUN] Would upload {local} → {remote_dir}/{fname}")
 			else:
-				client.connect()
-				client.make_dir(remote_dir)
-				client.change_dir(remote_dir)
-				for fname in files_to_upload:
-					local = os.path.join(dirpath, fname)
-					client.upload_file(local, fname)
-					if is_fastq_file(fname):
-						try:
-							if os.path.islink(local):
-								os.remove(local)
-								logging.info(f"Deleted symlinked FASTQ file after upload: {local}")
-							else:
-								logging.warning(f"FASTQ file {local} is not a symlink - skipping deletion for safety")
-						except Exception as e:
-							logging.warning(f"Could not delete FASTQ file {local}: {e}")
-				client.close()
+				# Uploaded with the other directories once the whole folder has been walked;
+				# FASTQs are only deleted once their whole directory is up, so a retry can still read them
+				scheduler.add_directory(dirpath, remote_dir, files_to_upload, on_complete=delete_uploaded_fastqs)
 
 		elif any(f.endswith('.zip') for f in files):
 			# Handle non-ftp submissions (directories with a zip file but without submission.xml and submit.ready)
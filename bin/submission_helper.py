@@ -8,17 +8,23 @@ import yaml
 import json
 import logging
 import xml.etree.ElementTree as ET
-import xml.dom.minidom as minidom  # Import minidom for pretty-printing
 import math  # Required for isnan check
 import time
 import shlex
+import hashlib
+import posixpath
+import threading
+from stat import S_ISREG
 import subprocess
 from typing import Optional, List
+from functools import lru_cache
 import pandas as pd
 from abc import ABC, abstractmethod
 import paramiko
 import ftplib
-from nameparser import HumanName
+from author_parsing import parse_author_list
+from package_schema import load_package_schema
+from xml_writer import StreamingXMLWriter, XMLTemplate, Field, Block
 from zipfile import ZipFile
 import smtplib
 from email.mime.multipart import MIMEMultipart
@@ -352,6 +358,8 @@ class GetParams:
 		parser.add_argument("--biosample", help="Optional flag to run BioSample submission", action="store_const", default=False, const=True)
 		parser.add_argument("--sra", help="Optional flag to run SRA submission", action="store_const", default=False, const=True)
 		parser.add_argument("--wastewater", action="store_true", help="Prepare submission with wastewater specific metadata")
+		parser.add_argument("--compact", action="store_true", help="Store repetitive metadata columns as categoricals to save memory")
+		parser.add_argument("--biosample_fields_key", help="Path to file with BioSample required fields and attribute columns", required=False, default=None)
 		parser.add_argument("--dry_run", action="store_true", help="Print what would be uploaded but don't connect or transfer files")
 		return parser
 
@@ -403,54 +411,66 @@ class Sample:
 			f"fasta_file={self.fasta_file}, annotation_file={self.annotation_file})"
 		)
 
+class MetadataIndex:
+	""" Metadata of a batch indexed by sample_name, each sample's row converted once into a record dict
+		Preparing a batch then looks samples up in a dict instead of filtering the dataframe once per sample.
+	"""
+	def __init__(self, metadata_df):
+		self.columns = tuple(metadata_df.columns)
+		self.records = {}
+		for record in metadata_df.to_dict(orient='records'):
+			self.records.setdefault(str(record['sample_name']), record)  # the first row of a repeated sample wins
+	def record(self, sample_id):
+		if str(sample_id) not in self.records:
+			raise KeyError(f"Sample {sample_id} is not in the batch metadata")
+		return self.records[str(sample_id)]
+
+@lru_cache(maxsize=None)
+def load_custom_columns(json_file_path):
+	"""
+	Load custom metadata columns from the JSON file (for custom BS packages)
+	"""
+	if not json_file_path:
+		return ()
+	try:
+		with open(json_file_path, 'r') as f:
+			custom_metadata = json.load(f)
+		return tuple(
+			value.get('new_field_name', key).strip() or key.strip() # fall back to JSON key if new_field_name empty
+			for key, value in custom_metadata.items()
+		)
+	except Exception as e:
+		logging.info(f"Error loading custom metadata file: {e}")
+		return ()
+
 class MetadataParser:
-	def __init__(self, metadata_df, parameters):
-		self.metadata_df = metadata_df
+	""" Extracts the metadata blocks of one sample
+		metadata: the sample's record dict (see MetadataIndex), or a dataframe whose first row is the sample
+	"""
+	def __init__(self, metadata, parameters):
+		if isinstance(metadata, pd.DataFrame):
+			metadata = metadata.iloc[:1].to_dict(orient='records')[0] if len(metadata) else dict.fromkeys(metadata.columns)
+		self.record = metadata
+		self.columns = tuple(metadata)
 		self.parameters = parameters
-		self.custom_columns = self.load_custom_columns()
-	def load_custom_columns(self):
+		self.schema = load_package_schema(parameters.get('biosample_fields_key'))
+		self.custom_columns = load_custom_columns(parameters.get('custom_metadata_file'))
+	def available_columns(self, role):
 		"""
-		Load custom metadata columns from the JSON file (for custom BS packages)
+		Columns of a package schema role followed by the custom columns, keeping the ones in the metadata
 		"""
-		json_file_path = self.parameters.get('custom_metadata_file')
-		if not json_file_path:
-			return []
-		try:
-			with open(json_file_path, 'r') as f:
-				custom_metadata = json.load(f)
-			custom_columns = [
-				value.get('new_field_name', key).strip() or key.strip() # fall back to JSON key if new_field_name empty
-				for key, value in custom_metadata.items()
-			]
-			return custom_columns
-		except Exception as e:
-			logging.info(f"Error loading custom metadata file: {e}")
-			return []
+		return list(self.schema.available(role, self.columns)) + [col for col in self.custom_columns if col in self.record]
+	def select(self, columns):
+		return {col: self.record[col] for col in columns if col in self.record}
 	def extract_top_metadata(self):
 		columns = ['sequence_name', 'title', 'description', 'authors', 'ncbi-bioproject', 'ncbi-spuid', 'ncbi-spuid-sra']  # Main columns
-		available_columns = [col for col in columns if col in self.metadata_df.columns]
-		return self.metadata_df[available_columns].to_dict(orient='records')[0] if available_columns else {}
+		return self.select(columns)
 	
 	def extract_biosample_metadata(self):
-		columns = ['strain','isolate','host_disease','host','collected_by','lat_lon','geo_loc_name','organism',
-				   'sample_type','collection_date','isolation_source','host_age','host_sex', 'race','ethnicity']  # BioSample specific columns
-		all_columns = columns + self.custom_columns # add custom columns to BioSample specific cols
-		available_columns = [col for col in all_columns if col in self.metadata_df.columns]
-		return self.metadata_df[available_columns].to_dict(orient='records')[0] if available_columns else {}
+		return self.select(self.available_columns('biosample_attributes')) # BioSample specific columns + custom columns
 	
 	def extract_wastewater_metadata(self):
-		columns =  [ "description", "isolation_source", "organism", "collection_date", "collection_time", "country", "state", "collection_site_id", 
-			"project_name", "collected_by", "purpose_of_ww_sampling", "ww_sample_site", "ww_flow", "instantaneous_flow", "ww_population", "ww_surv_jurisdiction", 
-			"ww_population_source", "ww_sample_matrix", "ww_sample_type", "collection_volume", "ww_sample_duration", "ww_temperature", "ww_ph", "ww_industrial_effluent_percent", 
-			"ww_sample_salinity", "ww_total_suspended_solids", "ww_surv_system_sample_id", "ww_pre_treatment", "ww_primary_sludge_retention_time", "specimen_processing",
-			"specimen_processing_id", "specimen_processing_details", "ww_processing_protocol", "concentration_method", "extraction_method", "extraction_control", "ww_endog_control_1",
-			"ww_endog_control_1_conc", "ww_endog_control_1_protocol", "ww_endog_control_1_units", "ww_endog_control_2", "ww_endog_control_2_conc", "ww_endog_control_2_protocol", 
-			"ww_endog_control_2_units", "ww_surv_target_1", "ww_surv_target_1_known_present", "ww_surv_target_1_protocol", "ww_surv_target_1_conc", "ww_surv_target_1_conc_unit", 
-			"ww_surv_target_1_gene", "ww_surv_target_2", "ww_surv_target_2_conc", "ww_surv_target_2_conc_unit", "ww_surv_target_2_gene", "ww_surv_target_2_known_present",
-			"purpose_of_ww_sequencing", "sequenced_by" ]
-		all_columns = columns + self.custom_columns 
-		available_columns = [col for col in all_columns if col in self.metadata_df.columns]
-		record = self.metadata_df[available_columns].to_dict(orient='records')[0] if available_columns else {}
+		record = self.select(self.available_columns('wastewater_attributes'))
 		# Filter out empty/NaN values
 		return {k: v for k, v in record.items() if pd.notna(v) and v != ""}
 	
@@ -461,7 +481,7 @@ class MetadataParser:
 		}
 		def process_platform(prefix):
 			result = {}
-			for k, v in self.metadata_df.iloc[0].items():
+			for k, v in self.record.items():
 				if not k.startswith(f"{prefix}_"):
 					continue
 				key = k.replace(f"{prefix}_", "")
@@ -486,8 +506,7 @@ class MetadataParser:
 		# Genbank specific columns (expect authors, which is in extract_top_metadata)
 		columns = ['biosample_accession','submitting_lab','submitting_lab_division','submitting_lab_address','publication_status','publication_title',
 					'illumina_sequencing_instrument', 'nanopore_sequencing_instrument', 'assembly_protocol','assembly_method','mean_coverage'] 
-		available_columns = [col for col in columns if col in self.metadata_df.columns]
-		return self.metadata_df[available_columns].to_dict(orient='records')[0] if available_columns else {}
+		return self.select(columns)
 
 class Submission:
 	def __init__(self, parameters, submission_config, outdir, submission_mode, submission_dir, type, sample, identifier):
@@ -543,23 +562,132 @@ class Submission:
 	def close(self):
 		self.client.close()
 
+def file_md5(path, chunk_size=8 * 1024 * 1024):
+	md5 = hashlib.md5()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(chunk_size), b''):
+			md5.update(chunk)
+	return md5.hexdigest()
+
+class UploadStateFile:
+	""" Entries keyed by remote path, saved as JSON after every change so they survive a crash
+		Shared by the upload streams, so every change holds the lock.
+	"""
+	label = "upload state file"
+	def __init__(self, path):
+		self.path = path
+		self.lock = threading.Lock()
+		self.entries = {}
+		if os.path.exists(path):
+			try:
+				with open(path, 'r') as f:
+					self.entries = json.load(f)
+			except (OSError, ValueError) as e:
+				logging.warning(f"Ignoring unreadable {self.label} {path}: {e}")
+	def save(self):
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, 'w') as f:
+			json.dump(self.entries, f, indent=1)
+		os.replace(tmp_path, self.path)
+
+class TransferJournal(UploadStateFile):
+	""" Every unfinished upload, kept in a JSON file so a retry or a re-run can resume it
+		An entry is only trusted while the local file keeps the size and mtime it had when the upload started.
+		Progress is not recorded while bytes are sent: a resume trusts the size the server reports for the partial
+		file, and 'confirmed' only holds the size the last attempt started from, below which it must not have shrunk.
+		Clients with a journal also check the remote size once an upload ends before finishing its entry.
+	"""
+	label = "transfer journal"
+	def begin(self, remote_path, local_path, remote_size):
+		""" Returns the byte offset to upload local_path from and records the upload as started
+			Resumes only if the journal has an entry for the same local file and the remote file holds at least the
+			confirmed bytes but not yet the whole file; otherwise the upload starts over from 0.
+		"""
+		local_stat = os.stat(local_path)
+		with self.lock:
+			entry = self.entries.get(remote_path)
+			offset = 0
+			if (entry and remote_size is not None and entry['size'] == local_stat.st_size and entry['mtime'] == local_stat.st_mtime
+					and entry['confirmed'] <= remote_size < local_stat.st_size):
+				offset = remote_size
+			self.entries[remote_path] = {'local_path': local_path, 'size': local_stat.st_size, 'mtime': local_stat.st_mtime, 'confirmed': offset}
+			self.save()
+		return offset
+	def finish(self, remote_path):
+		with self.lock:
+			if self.entries.pop(remote_path, None) is not None:
+				self.save()
+
+def check_remote_size(client, file_path, destination_path):
+	""" Raises IOError if the server reports a size for the uploaded file other than the local one
+		A server that cannot report sizes (SIZE rejected) is trusted, as it would be without a journal.
+	"""
+	remote_size = client.remote_size(destination_path)
+	if remote_size is None:
+		logging.debug(f"Could not get the remote size of {destination_path}, not verifying the upload")
+	elif remote_size != os.path.getsize(file_path):
+		raise IOError(f"remote size {remote_size} does not match local size {os.path.getsize(file_path)}")
+
+class UploadManifest(UploadStateFile):
+	""" Files uploaded in full, with the size, mtime and (optionally) MD5 they had when they were sent
+		A re-run skips a file whose entry still matches the local file and whose remote copy has the same size.
+	"""
+	label = "upload manifest"
+	def __init__(self, path, checksum=False):
+		super().__init__(path)
+		self.checksum = checksum
+	def matches(self, remote_path, local_path):
+		""" Whether local_path is the file recorded as uploaded to remote_path
+		"""
+		entry = self.entries.get(remote_path)
+		if not entry:
+			return False
+		local_stat = os.stat(local_path)
+		if entry['size'] != local_stat.st_size or entry['mtime'] != local_stat.st_mtime:
+			return False
+		if self.checksum:
+			return entry.get('md5') == file_md5(local_path)
+		return True
+	def record(self, remote_path, local_path):
+		local_stat = os.stat(local_path)
+		entry = {'local_path': local_path, 'size': local_stat.st_size, 'mtime': local_stat.st_mtime}
+		if self.checksum:
+			entry['md5'] = file_md5(local_path)
+		with self.lock:
+			self.entries[remote_path] = entry
+			self.save()
+
 class SFTPClient:
-	def __init__(self, config):
+	def __init__(self, config, journal=None):
 		self.host = config['NCBI_sftp_host']
 		self.username = config['NCBI_username']
 		self.password = config['NCBI_password']
 		self.port = config.get('port', 22)
 		self.sftp = None
 		self.ssh = None
+		self.home_dir = None
+		self.journal = journal
 	def connect(self):
 		try:
 			self.ssh = paramiko.SSHClient()
 			self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 			self.ssh.connect(self.host, username=self.username, password=self.password, port=self.port)
 			self.sftp = self.ssh.open_sftp()
+			self.home_dir = self.sftp.normalize('.')
 			logging.info(f"Connected to SFTP: {self.host}")
 		except Exception as e:
 			raise ConnectionError(f"Failed to connect to SFTP: {e}")
+	def is_alive(self):
+		""" Whether the session still answers, checked with a stat of the current directory
+		"""
+		try:
+			transport = self.ssh.get_transport() if self.ssh else None
+			if not (self.sftp and transport and transport.is_active()):
+				return False
+			self.sftp.stat('.')
+			return True
+		except Exception:
+			return False
 	def make_dir(self, dir_path):
 		try:
 			self.sftp.stat(dir_path)  # Will succeed if dir exists
@@ -595,9 +723,52 @@ class SFTPClient:
 			logging.info(f"Downloaded {remote_file} to {local_path}")
 		except Exception as e:
 			raise IOError(f"Failed to download {remote_file}: {e}")
-	def upload_file(self, file_path, destination_path):
+	def remote_size(self, file_path):
+		""" Size of a remote file in bytes, or None if it does not exist
+		"""
+		try:
+			return self.sftp.stat(file_path).st_size
+		except IOError:
+			return None
+	def list_sizes(self, dir_path):
+		""" {name: size} of the files in a remote directory from one listing, {} if it does not exist
+		"""
 		try:
-			self.sftp.put(file_path, destination_path)
+			return {attr.filename: attr.st_size for attr in self.sftp.listdir_attr(dir_path) if S_ISREG(attr.st_mode)}
+		except IOError:
+			return {}
+	def upload_file(self, file_path, destination_path, callback=None):
+		""" callback, if given, is called with the number of bytes sent as the transfer progresses
+		"""
+		try:
+			remote_path = posixpath.join(self.sftp.getcwd() or self.home_dir, destination_path) if self.journal else None
+			offset = self.journal.begin(remote_path, file_path, self.remote_size(destination_path)) if self.journal else 0
+			if offset:
+				# Write the missing bytes at their offset in the partial remote file
+				logging.info(f"Resuming {file_path} from byte {offset}")
+				with open(file_path, 'rb') as local, self.sftp.open(destination_path, 'r+') as remote:
+					remote.set_pipelined(True)
+					local.seek(offset)
+					remote.seek(offset)
+					while True:
+						chunk = local.read(32768)
+						if not chunk:
+							break
+						remote.write(chunk)
+						if callback:
+							callback(len(chunk))
+			else:
+				# paramiko reports running totals; pass on the increments
+				done = 0
+				def progress(transferred, total):
+					nonlocal done
+					if callback:
+						callback(transferred - done)
+					done = transferred
+				self.sftp.put(file_path, destination_path, callback=progress)
+			if self.journal:
+				check_remote_size(self, file_path, destination_path)
+				self.journal.finish(remote_path)
 			logging.info(f"Uploaded {file_path} to {destination_path}")
 		except Exception as e:
 			raise IOError(f"Failed to upload {file_path}: {e}")
@@ -609,18 +780,23 @@ class SFTPClient:
 		logging.info("SFTP connection closed.")
 
 class FTPClient:
-	def __init__(self, config):
+	def __init__(self, config, journal=None):
 		self.host = config['NCBI_ftp_host']
 		self.username = config['NCBI_username']
 		self.password = config['NCBI_password']
 		self.port = config.get('port', 21)  # Default FTP port is 21
 		self.ftp = None
+		self.home_dir = None
+		self.journal = journal
+		self.rest_stream = None
 	def connect(self):
 		try:
 			# Connect to FTP host and login
 			self.ftp = ftplib.FTP()
 			self.ftp.connect(self.host, self.port)
 			self.ftp.login(user=self.username, passwd=self.password)
+			self.home_dir = self.ftp.pwd()
+			self.rest_stream = None
 			logging.info(f"Connected to FTP: {self.host}:{self.port}")
 		except EOFError as e:
 			logging.info("EOFError occurred during FTP connection.")
@@ -628,6 +804,16 @@ class FTPClient:
 		except Exception as e:
 			logging.info(f"Unexpected error during FTP connection: {e}")
 			raise ConnectionError(f"Failed to connect to FTP: {e}")
+	def is_alive(self):
+		""" Whether the session still answers a NOOP
+		"""
+		if not self.ftp:
+			return False
+		try:
+			self.ftp.voidcmd('NOOP')
+			return True
+		except Exception:
+			return False
 	def make_dir(self, dir_path):
 		try:
 			current = self.ftp.pwd()
@@ -661,16 +847,61 @@ class FTPClient:
 		with open(local_path, 'wb') as f:
 			self.ftp.retrbinary(f'RETR {remote_file}', f.write)
 		logging.info(f"Downloaded file from {remote_file} to {local_path}")
-	def upload_file(self, file_path, destination_path):
+	def remote_size(self, file_path):
+		""" Size of a remote file in bytes, or None if it does not exist
+		"""
+		self.ftp.voidcmd('TYPE I')  # SIZE is only meaningful in binary mode
+		try:
+			return self.ftp.size(file_path)
+		except ftplib.error_perm:
+			return None
+	def list_sizes(self, dir_path):
+		""" {name: size} of the files in a remote directory from one MLSD listing, {} if it does not exist
+			Returns None if the server does not support MLSD.
+		"""
+		try:
+			return {name: int(facts['size']) for name, facts in self.ftp.mlsd(dir_path)
+					if facts.get('type') == 'file' and 'size' in facts}
+		except ftplib.error_perm as e:
+			if str(e).startswith('550'):
+				return {}
+			return None
+	def supports_rest(self):
+		""" Whether the server advertises REST STREAM, i.e. STOR can start at an offset
+		"""
+		if self.rest_stream is None:
+			try:
+				self.rest_stream = 'REST STREAM' in self.ftp.sendcmd('FEAT').upper()
+			except (ftplib.error_perm, ftplib.error_reply, ftplib.error_temp):
+				self.rest_stream = False
+		return self.rest_stream
+	def upload_file(self, file_path, destination_path, callback=None):
+		""" callback, if given, is called with the number of bytes sent as the transfer progresses
+		"""
+		block_sent = (lambda block: callback(len(block))) if callback else None
 		try:
 			if file_path.endswith(('.fasta', '.fastq', '.fna', '.fsa', '.gff', '.gff3', '.gz', 'xml', '.sqn', '.sbt', '.cmt')):  
+				remote_path = posixpath.join(self.ftp.pwd(), destination_path) if self.journal else None
+				offset = self.journal.begin(remote_path, file_path, self.remote_size(destination_path)) if self.journal else 0
 				with open(file_path, 'rb') as file:
-					logging.info(f"Uploading binary file: {file_path}")
-					self.ftp.storbinary(f'STOR {destination_path}', file)
+					if offset:
+						# Send only the missing bytes: REST + STOR where supported, otherwise append to the partial file
+						logging.info(f"Resuming binary file: {file_path} from byte {offset}")
+						file.seek(offset)
+						if self.supports_rest():
+							self.ftp.storbinary(f'STOR {destination_path}', file, callback=block_sent, rest=offset)
+						else:
+							self.ftp.storbinary(f'APPE {destination_path}', file, callback=block_sent)
+					else:
+						logging.info(f"Uploading binary file: {file_path}")
+						self.ftp.storbinary(f'STOR {destination_path}', file, callback=block_sent)
+				if self.journal:
+					check_remote_size(self, file_path, destination_path)
+					self.journal.finish(remote_path)
 			else:
 				with open(file_path, 'r') as file:
 					logging.info(f"Uploading text file: {file_path}")
-					self.ftp.storlines(f'STOR {destination_path}', file)
+					self.ftp.storlines(f'STOR {destination_path}', file, callback=block_sent)
 				# Open the file and upload it
 			logging.info(f"Uploaded {file_path} to {destination_path}")
 		except Exception as e:
@@ -683,6 +914,58 @@ class FTPClient:
 				self.ftp.close()  # Force close if quit() fails
 		logging.info("FTP connection closed.")
 
+class LoginError(ConnectionError):
+	""" Raised by SessionManager when connecting or logging in fails, as opposed to an open session dropping
+	"""
+
+class SessionManager:
+	""" Keeps one authenticated FTP/SFTP session open for a whole run
+		Every session() call checks the connection is still alive (NOOP for FTP, stat for SFTP), reconnects if it
+		dropped and returns the client in its login directory, so relative remote paths resolve as on a new connection.
+	"""
+	def __init__(self, client):
+		self.client = client
+		self.connected = False
+		self.handshakes = 0
+		self.sessions = 0
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.close()
+	def connect(self):
+		if self.connected:
+			try:
+				self.client.close()
+			except Exception as e:
+				logging.debug(f"Ignoring error while closing the dropped session: {e}")
+		try:
+			self.client.connect()
+		except Exception as e:
+			raise LoginError(str(e)) from e
+		self.connected = True
+		self.handshakes += 1
+	def session(self):
+		""" The live client, reconnecting first if needed
+		"""
+		self.sessions += 1
+		if not self.connected:
+			self.connect()
+		elif not self.client.is_alive():
+			logging.warning("The session was dropped by the server, reconnecting")
+			self.connect()
+		else:
+			self.client.change_dir(self.client.home_dir)
+		return self.client
+	def is_alive(self):
+		return self.connected and self.client.is_alive()
+	def close(self):
+		if self.connected:
+			self.client.close()
+			self.connected = False
+		if self.sessions:
+			logging.info(f"Used {self.handshakes} login(s) for {self.sessions} session(s), "
+						 f"{self.sessions - self.handshakes} handshake(s) saved by reusing the connection")
+
 class XMLSubmission(ABC):
 	def __init__(self, submission_config, metadata_df, outdir, parameters, sample):
 		self.submission_config = submission_config
@@ -690,14 +973,19 @@ class XMLSubmission(ABC):
 		self.parameters = parameters
 		self.metadata_df = metadata_df
 		self.sample = sample
+		self.xml_writer = None
+		self.templates = {}
 	def safe_text(self, value):
 		if value is None or (isinstance(value, float) and math.isnan(value)):
 			return "Not Provided"
 		return str(value)
 	def init_xml_root(self):
 		self.submission_root = ET.Element('Submission')
-		# Description
-		description = ET.SubElement(self.submission_root, 'Description')
+		self.submission_root.append(self.description_block())
+		self.flush_xml()
+	def description_block(self):
+		# Description, built from the submission config once per batch
+		description = ET.Element('Description')
 		if "Specified_Release_Date" in self.submission_config:
 			release_date_value = self.submission_config["Specified_Release_Date"]
 			if release_date_value and release_date_value != "Not Provided":
@@ -720,20 +1008,40 @@ class XMLSubmission(ABC):
 		contact_name = ET.SubElement(contact_el, 'Name')
 		ET.SubElement(contact_name, 'First').text = self.safe_text(self.submission_config['Submitter']['Name']['First'])
 		ET.SubElement(contact_name, 'Last').text = self.safe_text(self.submission_config['Submitter']['Name']['Last'])
+		return description
+	def compiled(self, build):
+		""" XMLTemplate of the element returned by build(), compiled on first use and reused for the rest of the batch
+			build() lays out the config-derived parts of a block and marks what varies per sample with Field/Block.
+		"""
+		if build.__name__ not in self.templates:
+			self.templates[build.__name__] = XMLTemplate(build())
+		return self.templates[build.__name__]
+	def write_template(self, build, fields, blocks=None):
+		""" Renders a compiled block with one sample's values into submission.xml
+		"""
+		self.flush_xml()
+		self.xml_writer.write_rendered(self.compiled(build).render(fields, blocks))
+	def flush_xml(self):
+		""" Writes the finished top-level blocks of submission.xml and drops them from the tree
+			Only the block being built is ever held in memory; the output matches minidom's toprettyxml(indent="  ").
+		"""
+		if self.xml_writer is None:
+			self.xml_writer = StreamingXMLWriter(os.path.join(self.outdir, "submission.xml"))
+		for block in self.submission_root:
+			self.xml_writer.write(block)
+		del self.submission_root[:]
 	def finalize_xml(self):
+		self.flush_xml()
+		self.xml_writer.close()
+		self.xml_writer = None
 		xml_output_path = os.path.join(self.outdir, "submission.xml")
-		rough_string = ET.tostring(self.submission_root, encoding='utf-8')
-		reparsed = minidom.parseString(rough_string)
-		pretty_xml = reparsed.toprettyxml(indent="  ")
-		with open(xml_output_path, 'w', encoding='utf-8') as f:
-			f.write(pretty_xml)
 		logging.info(f"Batch XML generated at {xml_output_path}")
 		self.xml_output_path = xml_output_path
-	def add_sample(self, sample, metadata_df, platform=None):
+	def add_sample(self, sample, metadata, platform=None):
 		# Support passing each sample object and its associated metadata (for the per-sample blocks)
+		# metadata is the sample's record from a MetadataIndex (a one-row dataframe also works)
 		self.sample = sample
-		self.metadata_df = metadata_df
-		parser = MetadataParser(self.metadata_df, self.parameters)
+		parser = MetadataParser(metadata, self.parameters)
 		self.top_metadata = parser.extract_top_metadata()
 		self.biosample_metadata = parser.extract_biosample_metadata()
 		self.wastewater_metadata = parser.extract_wastewater_metadata()
@@ -745,9 +1053,8 @@ class XMLSubmission(ABC):
 			# fallback for single-platform submission
 			self.sra_metadata = all_platform_metadata[0][1] if all_platform_metadata else {}
 		# Call subclass-specific methods to add the unique parts (guard the calls because GenbankSubmission doesn't use them)
-		if hasattr(self, "add_action_block") and hasattr(self, "add_attributes_block"):
-			anchor_element = self.add_action_block(self.submission_root)
-			self.add_attributes_block(anchor_element)
+		if hasattr(self, "action_block") and hasattr(self, "action_values"):
+			self.write_template(self.action_block, *self.action_values())
 		else:
 			logging.debug(f"{type(self).__name__} does not implement action/attributes block additions.")
 
@@ -756,12 +1063,12 @@ class XMLSubmissionMixin(ABC):
 		These are called during add_sample() in XMLSubmission.
 	"""
 	@abstractmethod
-	def add_action_block(self, submission):
-		"""Add the action block, which differs between submissions."""
+	def action_block(self):
+		"""Lay out the action block template, which differs between submissions."""
 		pass
 	@abstractmethod
-	def add_attributes_block(self, submission):
-		"""Add the attributes block, which differs between submissions."""
+	def action_values(self):
+		"""Return the (fields, blocks) that fill the action block template for the current sample."""
 		pass
 
 class BiosampleSubmission(XMLSubmission, XMLSubmissionMixin, Submission):
@@ -773,8 +1080,8 @@ class BiosampleSubmission(XMLSubmission, XMLSubmissionMixin, Submission):
 		self.wastewater = bool(wastewater)
 		os.makedirs(self.outdir, exist_ok=True)
 
-	def add_action_block(self, submission):
-		action = ET.SubElement(submission, 'Action')
+	def action_block(self):
+		action = ET.Element('Action')
 		add_data = ET.SubElement(action, 'AddData', {'target_db': 'BioSample'})
 		data = ET.SubElement(add_data, 'Data', {'content_type': 'xml'})
 		xml_content = ET.SubElement(data, 'XmlContent')
@@ -784,47 +1091,48 @@ class BiosampleSubmission(XMLSubmission, XMLSubmissionMixin, Submission):
 		spuid_namespace_value = self.safe_text(self.submission_config['NCBI_Namespace'])
 		sample_id = ET.SubElement(biosample, 'SampleId')
 		spuid = ET.SubElement(sample_id, 'SPUID', {'spuid_namespace': f"{spuid_namespace_value}"})
-		spuid.text = self.safe_text(self.top_metadata['ncbi-spuid'])
-		# Descriptor with Title
-		descriptor = ET.SubElement(biosample, 'Descriptor')
-		title_val = self.top_metadata.get('title')
-		if pd.notna(title_val) and str(title_val).strip():
-			title = ET.SubElement(descriptor, 'Title')
-			title.text = self.safe_text(title_val)
+		spuid.text = Field('spuid')
+		# Descriptor with the optional Title
+		Block(ET.SubElement(biosample, 'Descriptor'), 'title')
 		# Organism section
 		organism = ET.SubElement(biosample, 'Organism')
 		organism_name = ET.SubElement(organism, 'OrganismName')
-		organism_name.text = self.safe_text(self.biosample_metadata['organism'])
+		organism_name.text = Field('organism')
 		# BioProject reference
 		bioproject = ET.SubElement(biosample, 'BioProject')
 		primary_id = ET.SubElement(bioproject, 'PrimaryId', {'db': 'BioProject'})
-		primary_id.text = self.safe_text(self.top_metadata['ncbi-bioproject'])
+		primary_id.text = Field('bioproject')
 		# Package
 		bs_package = ET.SubElement(biosample, 'Package')
 		bs_package.text = self.safe_text(self.submission_config['BioSample_package'])
+		Block(ET.SubElement(biosample, 'Attributes'), 'attributes')
 		# Identifier for initial submission 
 		# Include optional Accession link if updating a BioSample
 		identifier = ET.SubElement(add_data, 'Identifier')
 		if not self.accession_id:
 			spuid = ET.SubElement(identifier, 'SPUID', {'spuid_namespace': spuid_namespace_value})
-			spuid.text = self.safe_text(self.top_metadata['ncbi-spuid'])
+			spuid.text = Field('spuid')
 		else:
 			primary_id = ET.SubElement(identifier, 'PrimaryId', {'db': 'BioSample'})
 			primary_id.text = self.accession_id
-		return biosample
-	
-	def add_attributes_block(self, biosample):
-		attributes = ET.SubElement(biosample, 'Attributes')
+		return action
+
+	def action_values(self):
+		fields = {
+			'spuid': self.safe_text(self.top_metadata['ncbi-spuid']),
+			'organism': self.safe_text(self.biosample_metadata['organism']),
+			'bioproject': self.safe_text(self.top_metadata['ncbi-bioproject'])
+		}
+		title_val = self.top_metadata.get('title')
+		title = [('Title', {}, self.safe_text(title_val))] if pd.notna(title_val) and str(title_val).strip() else []
 		# Select the appropriate metadata source
 		metadata = self.wastewater_metadata if self.wastewater else self.biosample_metadata
 		# Fields to ignore when adding attributes
 		ignored_fields = {'organism', 'test_field_1', 'test_field_2', 'test_field_3', 'new_field_name', 'new_field_name2'}
-		
 		# Add attributes for all non-ignored fields
-		for attr_name, attr_value in metadata.items():
-			if attr_name not in ignored_fields:
-				attribute = ET.SubElement(attributes, 'Attribute', {'attribute_name': attr_name})
-				attribute.text = self.safe_text(attr_value)
+		attributes = [('Attribute', {'attribute_name': attr_name}, self.safe_text(attr_value))
+					  for attr_name, attr_value in metadata.items() if attr_name not in ignored_fields]
+		return fields, {'title': title, 'attributes': attributes}
 
 class SRASubmission(XMLSubmission, XMLSubmissionMixin, Submission):
 	def __init__(self, parameters, submission_config, metadata_df, outdir, submission_mode,
@@ -836,40 +1144,46 @@ class SRASubmission(XMLSubmission, XMLSubmissionMixin, Submission):
 		self.wastewater = bool(wastewater)
 		os.makedirs(self.outdir, exist_ok=True)
 
-	def add_action_block(self, submission):
-		action = ET.SubElement(submission, "Action")
+	def action_block(self):
+		action = ET.Element("Action")
 		add_files = ET.SubElement(action, "AddFiles", target_db="SRA")
-		ext1 = get_compound_extension(self.sample.fastq1)
-		ext2 = get_compound_extension(self.sample.fastq2)
-		fastq1 = f"{self.sample.sample_id}_R1{ext1}"
-		fastq2 = f"{self.sample.sample_id}_R2{ext2}"
-		file1 = ET.SubElement(add_files, "File", file_path=fastq1)
+		file1 = ET.SubElement(add_files, "File", file_path=Field("fastq1"))
 		data_type1 = ET.SubElement(file1, "DataType")
 		data_type1.text = "generic-data"
-		file2 = ET.SubElement(add_files, "File", file_path=fastq2)
+		file2 = ET.SubElement(add_files, "File", file_path=Field("fastq2"))
 		data_type2 = ET.SubElement(file2, "DataType")
 		data_type2.text = "generic-data"
-		return add_files
-	
-	def add_attributes_block(self, add_files):
-		for attr_name, attr_value in self.sra_metadata.items():
-			attribute = ET.SubElement(add_files, 'Attribute', {'name': attr_name})
-			attribute.text = self.safe_text(attr_value)
+		Block(add_files, "attributes")
 		spuid_namespace_value = self.safe_text(self.submission_config['NCBI_Namespace'])
 		# BioProject reference
 		attribute_ref_id_bioproject = ET.SubElement(add_files, "AttributeRefId", name="BioProject")
 		refid_bioproject = ET.SubElement(attribute_ref_id_bioproject, "RefId")
 		primaryid_bioproject = ET.SubElement(refid_bioproject, "PrimaryId")
-		primaryid_bioproject.text = self.safe_text(self.top_metadata['ncbi-bioproject'])
+		primaryid_bioproject.text = Field("bioproject")
 		# BioSample reference
 		attribute_ref_id_biosample = ET.SubElement(add_files, "AttributeRefId", name="BioSample")
 		refid_biosample = ET.SubElement(attribute_ref_id_biosample, "RefId")
 		spuid_biosample = ET.SubElement(refid_biosample, "SPUID", {'spuid_namespace': f"{spuid_namespace_value}"})
-		spuid_biosample.text = self.safe_text(self.top_metadata['ncbi-spuid'])
+		spuid_biosample.text = Field("spuid")
 		# Identifier
 		identifier = ET.SubElement(add_files, 'Identifier')
 		identifier_spuid = ET.SubElement(identifier, 'SPUID', {'spuid_namespace': f"{spuid_namespace_value}"})
-		identifier_spuid.text = self.safe_text(f"{self.top_metadata['ncbi-spuid-sra']}")
+		identifier_spuid.text = Field("spuid_sra")
+		return action
+
+	def action_values(self):
+		ext1 = get_compound_extension(self.sample.fastq1)
+		ext2 = get_compound_extension(self.sample.fastq2)
+		fields = {
+			"fastq1": f"{self.sample.sample_id}_R1{ext1}",
+			"fastq2": f"{self.sample.sample_id}_R2{ext2}",
+			"bioproject": self.safe_text(self.top_metadata['ncbi-bioproject']),
+			"spuid": self.safe_text(self.top_metadata['ncbi-spuid']),
+			"spuid_sra": self.safe_text(f"{self.top_metadata['ncbi-spuid-sra']}")
+		}
+		attributes = [('Attribute', {'name': attr_name}, self.safe_text(attr_value))
+					  for attr_name, attr_value in self.sra_metadata.items()]
+		return fields, {"attributes": attributes}
 
 class GenbankSubmission(XMLSubmission, Submission):
 	def __init__(self, parameters, submission_config, metadata_df, outdir, submission_mode, submission_dir, type, samples, sample, accession_id = None, identifier = None):
@@ -937,10 +1251,20 @@ class GenbankSubmission(XMLSubmission, Submission):
 	def xml_create_wgs(self):
 		# Create root Submission element
 		self.init_xml_root() # Write first part of submission.xml (Description)
+		self.write_template(self.wgs_action_block, {
+			"sqn": f"{self.sample.sample_id}.sqn",
+			"bioproject": self.safe_text(self.top_metadata["ncbi-bioproject"]),
+			"biosample": self.safe_text(self.genbank_metadata["biosample_accession"]),
+			"spuid": self.safe_text(f'{self.top_metadata["ncbi-spuid"]}-GB')
+		})
+		self.finalize_xml()
+		# todo: the order & placement of these calls is different from BS and SRA, and this bothers me
+
+	def wgs_action_block(self):
 		# --- Action: AddFiles (WGS) ---
-		action1 = ET.SubElement(self.submission_root, "Action")
+		action1 = ET.Element("Action")
 		add_files = ET.SubElement(action1, "AddFiles", target_db="WGS")
-		file1 = ET.SubElement(add_files, "File", file_path=f"{self.sample.sample_id}.sqn")
+		file1 = ET.SubElement(add_files, "File", file_path=Field("sqn"))
 		ET.SubElement(file1, "DataType").text = "wgs-contigs-sqn"
 		# Meta content with genome description
 		meta = ET.SubElement(add_files, "Meta", content_type="XML")
@@ -956,19 +1280,18 @@ class GenbankSubmission(XMLSubmission, Submission):
 		attribute_ref = ET.SubElement(add_files, "AttributeRefId")
 		ref_id = ET.SubElement(attribute_ref, "RefId")
 		primary_id = ET.SubElement(ref_id, "PrimaryId", db="BioProject")
-		primary_id.text = self.safe_text(self.top_metadata["ncbi-bioproject"])
+		primary_id.text = Field("bioproject")
 		# AttributeRefId for BioSample
 		attribute_ref = ET.SubElement(add_files, "AttributeRefId")
 		ref_id = ET.SubElement(attribute_ref, "RefId")
 		primary_id = ET.SubElement(ref_id, "PrimaryId", db="BioSample")
-		primary_id.text = self.safe_text(self.genbank_metadata["biosample_accession"])
+		primary_id.text = Field("biosample")
 		# Identifier with SPUID
 		identifier = ET.SubElement(add_files, "Identifier")
 		spuid_namespace_value = self.safe_text(self.submission_config['NCBI_Namespace'])
 		spuid = ET.SubElement(identifier, 'SPUID', {'spuid_namespace': f"{spuid_namespace_value}"})
-		spuid.text = self.safe_text(f'{self.top_metadata["ncbi-spuid"]}-GB')
-		self.finalize_xml()
-		# todo: the order & placement of these calls is different from BS and SRA, and this bothers me
+		spuid.text = Field("spuid")
+		return action1
 
 	# Functions for preparing files for table2asn
 	def create_source_file(self):
@@ -1001,6 +1324,33 @@ class GenbankSubmission(XMLSubmission, Submission):
 		comment_df = pd.DataFrame([comment_data])
 		comment_df.to_csv(os.path.join(self.outdir, "comment.cmt"), sep="\t", index=False)
 
+	def write_author_names(self, f, authors):
+		""" Writes the name entries of an authorset 'names std' block for a '; '-separated author list """
+		authors = self.safe_text(authors)
+		if authors.split("; ")[0] in ["Not Provided", ""]:
+			return
+		# Parsed once per distinct list; batches usually share the same authors
+		names = parse_author_list(authors)
+		for index, name in enumerate(names, start=1):
+			f.write("        {\n")
+			f.write("          name name {\n")
+			f.write("            last \"" + self.safe_text(name.last) + "\",\n")
+			f.write("            first \"" + self.safe_text(name.first) + "\"")
+			middle_name = self.safe_text(name.middle)
+			if middle_name != "Not Provided":
+				f.write(",\n            middle \"" + middle_name + "\"")
+			suffix = self.safe_text(name.suffix)
+			if suffix != "Not Provided":
+				f.write(",\n            suffix \"" + suffix + "\"")
+			title = self.safe_text(name.title)
+			if title != "Not Provided":
+				f.write(",\n            title \"" + title + "\"")
+			f.write("\n          }\n")
+			if index == len(names):
+				f.write("        }\n")
+			else:
+				f.write("        },\n")
+
 	def create_authorset_file(self):
 		""" Create the authorset.sbt file that is required for table2asn to run """
 		submitter_first = self.submission_config["Submitter"]["Name"]["First"]
@@ -1047,30 +1397,7 @@ class GenbankSubmission(XMLSubmission, Submission):
 			f.write("  cit {\n")
 			f.write("    authors {\n")
 			f.write("      names std {\n")
-			authors_list = self.safe_text(self.genbank_metadata.get("authors")).split("; ")
-			if authors_list[0] not in ["Not Provided", ""]:
-				total_names = len(authors_list)
-				for index, author in enumerate(authors_list, start=1):
-					# Parse the author name into first, middle, last, suffix, title
-					name = HumanName(author.strip())
-					f.write("        {\n")
-					f.write("          name name {\n")
-					f.write("            last \"" + self.safe_text(name.last) + "\",\n")
-					f.write("            first \"" + self.safe_text(name.first) + "\"")
-					middle_name = self.safe_text(name.middle)
-					if middle_name != "Not Provided":
-						f.write(",\n            middle \"" + middle_name + "\"")
-					suffix = self.safe_text(name.suffix)
-					if suffix != "Not Provided":
-						f.write(",\n            suffix \"" + suffix + "\"")
-					title = self.safe_text(name.title)
-					if title != "Not Provided":
-						f.write(",\n            title \"" + title + "\"")
-					f.write("\n          }\n")
-					if index == total_names:
-						f.write("        }\n")
-					else:
-						f.write("        },\n")
+			self.write_author_names(f, self.genbank_metadata.get("authors"))
 			f.write("      },\n")
 			f.write("      affil std {\n")
 			f.write("        affil \"" + affil + "\",\n")
@@ -1091,30 +1418,7 @@ class GenbankSubmission(XMLSubmission, Submission):
 			f.write("      cit \"" + publication_status + "\",\n")
 			f.write("      authors {\n")
 			f.write("        names std {\n")
-			authors_list = self.safe_text(self.top_metadata.get("authors")).split("; ")
-			if authors_list[0] not in ["Not Provided", ""]:
-				total_names = len(authors_list)
-				for index, author in enumerate(authors_list, start=1):
-					# Parse the author name into first, middle, last, suffix, title
-					name = HumanName(author.strip())
-					f.write("        {\n")
-					f.write("          name name {\n")
-					f.write("            last \"" + self.safe_text(name.last) + "\",\n")
-					f.write("            first \"" + self.safe_text(name.first) + "\"")
-					middle_name = self.safe_text(name.middle)
-					if middle_name != "Not Provided":
-						f.write(",\n            middle \"" + middle_name + "\"")
-					suffix = self.safe_text(name.suffix)
-					if suffix != "Not Provided":
-						f.write(",\n            suffix \"" + suffix + "\"")
-					title = self.safe_text(name.title)
-					if title != "Not Provided":
-						f.write(",\n            title \"" + title + "\"")
-					f.write("\n          }\n")
-					if index == total_names:
-						f.write("        }\n")
-					else:
-						f.write("        },\n")
+			self.write_author_names(f, self.top_metadata.get("authors"))
 			f.write("        }\n")
 			f.write("      },\n")
 			f.write("      title \"" + publication_title + "\"\n")
@@ -10,9 +10,12 @@ from submission_helper import (
 	BiosampleSubmission,
 	SRASubmission,
 	GenbankSubmission,
+	MetadataIndex,
 	get_compound_extension,
 	setup_logging
 )
+from metadata_loader import compact_frame
+from author_parsing import cache_stats
 
 def prepare_sra_fastqs(samples, outdir, copy=False):
 	for sample in samples:
@@ -46,6 +49,10 @@ def main_prepare():
 	config = SubmissionConfigParser(params).load_config()
 	batch_id = os.path.splitext(os.path.basename(params['metadata_file']))[0]
 	metadata_df = pd.read_csv(params['metadata_file'], sep='\t')
+	if params['compact']:
+		compact_frame(metadata_df)
+	# Every sample's row is looked up by sample_name, once for BioSample and once per SRA platform
+	metadata_index = MetadataIndex(metadata_df)
 	identifier = params['identifier']
 	submission_dir = 'Test' if params['test'] else 'Production'
 	output_root = params['outdir']
@@ -85,8 +92,7 @@ def main_prepare():
 		)
 		bs.init_xml_root()
 		for s in samples:
-			md = metadata_df[metadata_df['sample_name'] == s.sample_id]
-			bs.add_sample(s, md)
+			bs.add_sample(s, metadata_index.record(s.sample_id))
 		bs.finalize_xml()
 		# write submit.ready
 		open(os.path.join(submission_dir,'submit.ready'),'w').close()
@@ -116,8 +122,7 @@ def main_prepare():
 			)
 			sra.init_xml_root()
 			for s in samp_list:
-				md = metadata_df[metadata_df['sample_name'] == s.sample_id]
-				sra.add_sample(s, md, platform)  # existing signature
+				sra.add_sample(s, metadata_index.record(s.sample_id), platform)
 			sra.finalize_xml()
 			# write submit.ready
 			open(os.path.join(submission_dir,'submit.ready'),'w').close()
@@ -144,5 +149,8 @@ def main_prepare():
 			)
 			gb.genbank_submission_driver()
 
+	for line in cache_stats():
+		logging.info(line)
+
 if __name__=="__main__":
 	main_prepare()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+# Parallel upload of prepared submission directories
+# A bounded pool of N streams, each holding its own FTP/SFTP session, uploads the files of every queued directory
+# concurrently (largest files first). submit.ready is the barrier NCBI starts processing on, so it is only queued
+# once every other file of its directory has been uploaded, and never if one of them failed.
+# Only a session that dropped is reconnected and the file retried; a failed login stops the whole run, so bad
+# credentials are not tried again on every file and stream.
+# With an upload manifest, files recorded as sent whose remote copy (from one listing per directory) has the same size
+# are skipped, so re-running a finished or partly finished batch only sends what is missing.
+# The clients' progress callbacks feed a TransferMetrics collector, which logs periodic progress lines and writes
+# per-file bytes, duration, throughput, retries and reconnects to transfer_metrics.json.
+
+import os
+import json
+import time
+import posixpath
+import queue
+import logging
+import itertools
+import threading
+
+from submission_helper import SessionManager, LoginError
+
+# Attempts per file when the connection drops during its upload
+UPLOAD_ATTEMPTS = 3
+BARRIER_FILE = "submit.ready"
+# Seconds between progress lines
+PROGRESS_INTERVAL = 30
+
+
+def file_size(path):
+	try:
+		return os.path.getsize(path)
+	except OSError:
+		return 0  # reported when its upload fails
+
+
+def format_rate(n_bytes, seconds):
+	return f"{n_bytes / 1024 / 1024 / seconds:.2f} MB/s" if seconds > 0 else "n/a"
+
+
+class UploadDirectory:
+	""" One submission directory: its local files, remote folder and how many files are still outstanding
+	"""
+	def __init__(self, dirpath, remote_dir, files, on_complete=None):
+		self.dirpath = dirpath
+		self.remote_dir = remote_dir
+		self.files = [f for f in files if f != BARRIER_FILE]
+		self.barrier = BARRIER_FILE if BARRIER_FILE in files else None
+		self.on_complete = on_complete
+		self.pending = len(self.files)
+		self.failed = []
+		self.sent = 0
+		self.created = False
+		self.remote_sizes = None
+		self.listed = False
+		self.lock = threading.Lock()
+
+
+class UploadStream:
+	""" A worker thread with its own session; counts what it sends for the throughput report
+	"""
+	def __init__(self, number, client):
+		self.number = number
+		self.sessions = SessionManager(client)
+		self.files = 0
+		self.bytes = 0
+		self.seconds = 0.0
+		self.skipped = 0
+		self.skipped_bytes = 0
+		self.retries = 0
+
+	def summary(self):
+		return {
+			"stream": self.number,
+			"files": self.files,
+			"bytes_sent": self.bytes,
+			"seconds": round(self.seconds, 3),
+			"bytes_per_s": round(self.bytes / self.seconds) if self.seconds > 0 else None,
+			"skipped": self.skipped,
+			"retries": self.retries,
+			"logins": self.sessions.handshakes,
+			"reconnects": max(0, self.sessions.handshakes - 1)
+		}
+
+
+class TransferMetrics:
+	""" Per-file transfer records and the pool's running byte count, fed by the clients' progress callbacks
+		progress() is called from every stream; it logs a progress line with rate and ETA at most every interval s.
+	"""
+	def __init__(self, total_bytes, total_files, interval=PROGRESS_INTERVAL):
+		self.total_bytes = total_bytes
+		self.total_files = total_files
+		self.interval = interval
+		self.lock = threading.Lock()
+		self.records = []
+		self.sent = 0
+		self.skipped_bytes = 0
+		self.start = self.last_log = time.perf_counter()
+
+	def progress(self, n_bytes):
+		with self.lock:
+			self.sent += n_bytes
+			now = time.perf_counter()
+			if now - self.last_log < self.interval:
+				return
+			self.last_log = now
+			line = self.progress_line(now)
+		logging.info(line)
+
+	def progress_line(self, now):
+		elapsed = now - self.start
+		rate = self.sent / elapsed if elapsed > 0 else 0
+		remaining = max(0, self.total_bytes - self.skipped_bytes - self.sent)
+		eta = f"{remaining / rate:.0f} s" if rate > 0 else "unknown"
+		total = max(1, self.total_bytes - self.skipped_bytes)
+		return (f"Progress: {self.sent / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB ({100 * min(1, self.sent / total):.1f}%), "
+				f"{format_rate(self.sent, elapsed)}, ETA {eta}, {len(self.records)}/{self.total_files} file(s) done")
+
+	def record(self, stream, local_path, remote_path, status, size, bytes_sent=0, seconds=0.0, retries=0, error=None):
+		entry = {
+			"local_path": local_path,
+			"remote_path": remote_path,
+			"stream": stream.number,
+			"status": status,
+			"size": size,
+			"bytes_sent": bytes_sent,
+			"seconds": round(seconds, 3),
+			"bytes_per_s": round(bytes_sent / seconds) if seconds > 0 else None,
+			"retries": retries
+		}
+		if error:
+			entry["error"] = error
+		with self.lock:
+			self.records.append(entry)
+			if status == "skipped":
+				self.skipped_bytes += size
+
+	def write(self, path, streams, elapsed):
+		""" Writes the per-file records with per-stream and batch totals as JSON
+		"""
+		sent = sum(record["bytes_sent"] for record in self.records)
+		totals = {
+			"seconds": round(elapsed, 3),
+			"bytes_sent": sent,
+			"bytes_per_s": round(sent / elapsed) if elapsed > 0 else None,
+			"retries": sum(record["retries"] for record in self.records),
+			"reconnects": sum(max(0, stream.sessions.handshakes - 1) for stream in streams)
+		}
+		for status in ("uploaded", "skipped", "failed"):
+			totals[f"files_{status}"] = sum(1 for record in self.records if record["status"] == status)
+		with open(path, "w") as f:
+			json.dump({"totals": totals, "streams": [stream.summary() for stream in streams], "files": self.records}, f, indent=1)
+
+
+class UploadScheduler:
+	""" Uploads queued directories over a pool of concurrent sessions
+		client_factory() must return a new, unconnected FTPClient/SFTPClient for every stream.
+	"""
+	def __init__(self, client_factory, streams=1, manifest=None, metrics_path=None, progress_interval=PROGRESS_INTERVAL):
+		self.client_factory = client_factory
+		self.n_streams = max(1, int(streams))
+		self.manifest = manifest
+		self.metrics_path = metrics_path
+		self.progress_interval = progress_interval
+		self.directories = []
+		self.login_error = None
+
+	def add_directory(self, dirpath, remote_dir, files, on_complete=None):
+		""" Queues the files of dirpath for remote_dir; on_complete(dirpath, files) runs once all of them are up
+		"""
+		self.directories.append(UploadDirectory(dirpath, remote_dir, files, on_complete))
+
+	def run(self):
+		""" Uploads everything queued; raises IOError naming the directories that could not be completed
+		"""
+		if not self.directories:
+			return
+		# Barriers (priority 0) go ahead of the remaining files (priority 1); the counter keeps the order stable
+		self.queue = queue.PriorityQueue()
+		self.counter = itertools.count()
+		self.remaining = sum(len(d.files) + (1 if d.barrier else 0) for d in self.directories)
+		self.remaining_lock = threading.Lock()
+		self.done = threading.Event()
+		# Longest transfers first, so the pool does not end waiting on one large FASTQ
+		tasks = [(directory, fname) for directory in self.directories for fname in directory.files]
+		tasks.sort(key=lambda task: -file_size(os.path.join(task[0].dirpath, task[1])))
+		for directory, fname in tasks:
+			self.queue.put((1, next(self.counter), directory, fname))
+		total_bytes = sum(file_size(os.path.join(directory.dirpath, fname)) for directory, fname in tasks)
+		self.metrics = TransferMetrics(total_bytes, self.remaining, self.progress_interval)
+		for directory in self.directories:
+			if not directory.files:
+				self.release_barrier(directory)
+		streams = [UploadStream(n + 1, self.client_factory()) for n in range(min(self.n_streams, self.remaining))]
+		start = time.perf_counter()
+		# The summary and the metrics file are written however the run ends
+		try:
+			if streams:
+				# Log in once before starting the pool, so bad credentials fail on one login instead of one per stream;
+				# on failure the pool still drains the queue, recording every file as not attempted
+				try:
+					streams[0].sessions.connect()
+				except LoginError as e:
+					self.login_failed(streams[0], e)
+			if not self.remaining:
+				self.done.set()
+			threads = [threading.Thread(target=self.work, args=(stream,), name=f"upload-{stream.number}", daemon=True) for stream in streams]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+		finally:
+			elapsed = time.perf_counter() - start
+			self.report(streams, elapsed)
+			if self.metrics_path:
+				self.metrics.write(self.metrics_path, streams, elapsed)
+				logging.info(f"Transfer metrics written to {self.metrics_path}")
+		if self.login_error is not None:
+			raise IOError(f"Upload stopped after a failed login: {self.login_error}")
+		failed = [d.dirpath for d in self.directories if d.failed]
+		if failed:
+			raise IOError(f"Upload failed for {len(failed)} directory(ies): {', '.join(failed)}")
+
+	def release_barrier(self, directory):
+		""" Queues submit.ready ahead of any other file, now that the rest of its directory is uploaded
+		"""
+		if directory.barrier:
+			self.queue.put((0, next(self.counter), directory, directory.barrier))
+		elif directory.on_complete:
+			directory.on_complete(directory.dirpath, directory.files)
+
+	def complete(self, directory):
+		""" Called once every file but the barrier has been attempted
+		"""
+		if not directory.failed:
+			self.release_barrier(directory)
+		elif directory.barrier:
+			logging.error(f"Not sending {directory.barrier} for {directory.dirpath}: {', '.join(directory.failed)} failed to upload")
+			self.finish_task()
+
+	def login_failed(self, stream, error):
+		""" Stops the run: the files still queued are failed without another login attempt
+		"""
+		if self.login_error is None:
+			self.login_error = error
+			logging.error(f"[stream {stream.number}] Login failed, not attempting any further uploads: {error}")
+
+	def finish_task(self):
+		with self.remaining_lock:
+			self.remaining -= 1
+			if not self.remaining:
+				self.done.set()
+
+	def work(self, stream):
+		try:
+			while not self.done.is_set():
+				try:
+					_, _, directory, fname = self.queue.get(timeout=0.2)
+				except queue.Empty:
+					continue
+				self.upload(stream, directory, fname)
+		finally:
+			stream.sessions.close()
+
+	def upload(self, stream, directory, fname):
+		""" Uploads one file of a directory and releases the directory's barrier after its last other file
+		"""
+		try:
+			uploaded = self.skip(stream, directory, fname) or self.send(stream, directory, fname)
+			if fname == directory.barrier:
+				if not uploaded:
+					directory.failed.append(fname)
+				elif directory.on_complete:
+					directory.on_complete(directory.dirpath, directory.files + [fname])
+			else:
+				with directory.lock:
+					if not uploaded:
+						directory.failed.append(fname)
+					directory.pending -= 1
+					complete = directory.pending == 0
+				if complete:
+					self.complete(directory)
+		finally:
+			self.finish_task()
+
+	def skip(self, stream, directory, fname):
+		""" Whether the file is already on the server in full, per the manifest and the listing of its remote folder
+			submit.ready is sent again if any other file of its directory had to be.
+		"""
+		if not self.manifest or self.login_error is not None or (fname == directory.barrier and directory.sent):
+			return False
+		local = os.path.join(directory.dirpath, fname)
+		try:
+			if not self.manifest.matches(posixpath.join(directory.remote_dir, fname), local):
+				return False
+			remote_sizes = self.list_directory(stream, directory)
+			size = os.path.getsize(local)
+		except LoginError as e:
+			self.login_failed(stream, e)
+			return False
+		except Exception as e:
+			logging.warning(f"[stream {stream.number}] Could not check whether {local} is already uploaded: {e}")
+			return False
+		if remote_sizes is None or remote_sizes.get(fname) != size:
+			return False
+		logging.info(f"[stream {stream.number}] Skipping {local}: already uploaded to {directory.remote_dir}")
+		stream.skipped += 1
+		stream.skipped_bytes += size
+		self.metrics.record(stream, local, posixpath.join(directory.remote_dir, fname), "skipped", size)
+		return True
+
+	def list_directory(self, stream, directory):
+		""" {name: size} of the directory's remote folder, listed once by the first stream that needs it
+		"""
+		with directory.lock:
+			if not directory.listed:
+				directory.remote_sizes = stream.sessions.session().list_sizes(directory.remote_dir)
+				directory.listed = True
+				if directory.remote_sizes is None:
+					logging.info(f"The server cannot list {directory.remote_dir}, its files will be uploaded again")
+			return directory.remote_sizes
+
+	def send(self, stream, directory, fname):
+		""" Uploads one file on the stream's session, reconnecting if the connection dropped; returns success
+		"""
+		local = os.path.join(directory.dirpath, fname)
+		remote_path = posixpath.join(directory.remote_dir, fname)
+		sent = 0
+		seconds = 0.0
+		if self.login_error is not None:
+			self.metrics.record(stream, local, remote_path, "failed", file_size(local), error=f"not attempted: {self.login_error}")
+			return False
+
+		def progress(n_bytes):
+			nonlocal sent
+			sent += n_bytes
+			self.metrics.progress(n_bytes)
+
+		for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+			start = None
+			try:
+				client = stream.sessions.session()
+				self.enter_directory(client, directory)
+				start = time.perf_counter()
+				client.upload_file(local, fname, callback=progress)
+				seconds += time.perf_counter() - start
+				stream.files += 1
+				stream.bytes += sent
+				stream.seconds += seconds
+				with directory.lock:
+					directory.sent += 1
+				if self.manifest:
+					self.manifest.record(remote_path, local)
+				self.metrics.record(stream, local, remote_path, "uploaded", file_size(local), sent, seconds, attempt - 1)
+				return True
+			except LoginError as e:
+				self.login_failed(stream, e)
+				stream.bytes += sent
+				stream.seconds += seconds
+				self.metrics.record(stream, local, remote_path, "failed", file_size(local), sent, seconds, attempt - 1, str(e))
+				return False
+			except Exception as e:
+				if start is not None:
+					seconds += time.perf_counter() - start
+				if attempt < UPLOAD_ATTEMPTS and not stream.sessions.is_alive():
+					logging.warning(f"[stream {stream.number}] Connection lost while uploading {local} ({e}), retrying on a new session")
+					stream.retries += 1
+					continue
+				logging.error(f"[stream {stream.number}] Failed to upload {local}: {e}")
+				stream.bytes += sent
+				stream.seconds += seconds
+				self.metrics.record(stream, local, remote_path, "failed", file_size(local), sent, seconds, attempt - 1, str(e))
+				return False
+
+	def enter_directory(self, client, directory):
+		""" Changes into the directory's remote folder, creating it the first time any stream needs it
+		"""
+		with directory.lock:
+			if not directory.created:
+				client.make_dir(directory.remote_dir)
+				directory.created = True
+		client.change_dir(directory.remote_dir)
+
+	def report(self, streams, elapsed):
+		""" Logs the files, bytes and throughput of every stream and of the whole pool
+		"""
+		for stream in streams:
+			logging.info(f"[stream {stream.number}] {stream.files} file(s), {stream.bytes / 1024 / 1024:.1f} MB in "
+						 f"{stream.seconds:.1f} s ({format_rate(stream.bytes, stream.seconds)})")
+		total_bytes = sum(stream.bytes for stream in streams)
+		total_files = sum(stream.files for stream in streams)
+		logging.info(f"Uploaded {total_files} file(s), {total_bytes / 1024 / 1024:.1f} MB over {len(streams)} stream(s) in "
+					 f"{elapsed:.1f} s ({format_rate(total_bytes, elapsed)} aggregate)")
+		skipped = sum(stream.skipped for stream in streams)
+		if skipped:
+			skipped_bytes = sum(stream.skipped_bytes for stream in streams)
+			logging.info(f"Skipped {skipped} file(s), {skipped_bytes / 1024 / 1024:.1f} MB already on the server")
+		retries = sum(stream.retries for stream in streams)
+		if retries:
+			reconnects = sum(max(0, stream.sessions.handshakes - 1) for stream in streams)
+			logging.info(f"Retried {retries} upload(s) after dropped connections, {reconnects} reconnect(s)")
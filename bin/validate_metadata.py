@@ -4,33 +4,58 @@
 # Refactored and updated by J Rowell, AK Gupta, and KA O'Connell
 
 import os
+import numpy as np
 import pandas as pd
 import warnings
-import re
 import argparse
 import sys
-import math
 import yaml
 import json
 import shutil
+import logging
+import copy
+import gzip
+import hashlib
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from metadata_loader import read_metadata_sheet
+import validation_rules
+from author_parsing import clean_author_list, cache_stats
+from validation_report import write_report, REPORT_FILE
+from stage_profiler import StageProfiler
+from package_schema import load_package_schema
+from batch_planner import sample_bytes, plan_batches, batch_samples
+from validation_rules import (
+	RuleEngine,
+	RequiredIfPresentRule,
+	AllowedValuesRule,
+	NumericRangeRule,
+	UniqueRule,
+	TransformRule,
+	Vocabulary,
+	DerivedColumn,
+	allow_values
+)
 
 def metadata_validation_main():
 	""" Main for initiating metadata validation steps
 	"""
 	warnings.filterwarnings('ignore')
+	logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s", stream=sys.stdout)
 
 	# get all parameters needed for running the steps
 	parameters_class = GetParams()
 	parameters_class.get_parameters()
 	parameters = parameters_class.parameters
 
+	# per-stage wall/CPU time and memory, written to validation_timings.json with --profile
+	profiler = StageProfiler(enabled=parameters['profile'], dump_dir=parameters['profile_dump_dir'])
+
 	# call the constructor class for converting meta to df
-	meta_to_df = GetMetaAsDf(parameters)
-  
 	# print error message if ValueError is raised when GetMetaAsDf is run
 	try:
-		meta_to_df.load_meta()
+		with profiler.stage("load_metadata"):
+			meta_to_df = GetMetaAsDf(parameters)
 		print("Metadata loaded and validated successfully.")
 	except ValueError as e:
 		print(f"Error: {e}")
@@ -39,42 +64,69 @@ def metadata_validation_main():
 	filled_df = meta_to_df.df
 		
 	# call the main function for validating the metadata
-	validate_checks = ValidateChecks(filled_df, parameters, parameters_class)
+	validate_checks = ValidateChecks(filled_df, parameters, parameters_class, profiler=profiler)
 	validate_checks.validate_main()
+	filled_df = validate_checks.metadata_df
 	print(f"Available keys after validate_checks: {filled_df.keys().tolist()}")
 
 	# insert necessary columns in metadata dataframe
-	insert = HandleDfInserts(filled_df, parameters)
-	final_df = insert.handle_df_inserts() # final updated, validated dataframe
+	with profiler.stage("handle_df_inserts"):
+		insert = HandleDfInserts(filled_df, parameters)
+		final_df = insert.handle_df_inserts() # final updated, validated dataframe
 
 	# normalize all values here before batching
-	final_df = final_df.applymap(validate_checks.normalize_value)
+	with profiler.stage("normalize_values"):
+		final_df = validate_checks.normalize_values(final_df)
 
 	# output the batched tsv files  
-	batch_size = parameters['batch_size']
-	output_dir = ("batched_tsvs")
-	os.makedirs(output_dir, exist_ok=True)
-
-	total_rows = len(final_df)
-	num_batches = math.ceil(total_rows / batch_size)
-	batch_log = {}
-	print(f"batch size is {parameters['batch_size']} and number of batches is {num_batches}") # debug
+	with profiler.stage("write_batches"):
+		output_dir = ("batched_tsvs")
+		os.makedirs(output_dir, exist_ok=True)
+
+		# Batches are capped on samples and, with --max_batch_bytes, on the size of the sequence files
+		batches = plan_batches(sample_bytes(final_df, root=parameters['path_root']), parameters['batch_size'], parameters['max_batch_bytes'])
+		num_batches = len(batches)
+		batch_log = {}
+		print(f"batch size is {parameters['batch_size']} and number of batches is {num_batches}") # debug
+
+		# Batches whose content matches the previous run are copied over instead of rewritten
+		state = validate_checks.state
+		previous_batches = (validate_checks.previous_state or {}).get('batches', {})
+		row_hashes = pd.util.hash_pandas_object(final_df, index=False).to_numpy()
+		reused = 0
 	
-	for i in range(num_batches):
-		start_idx = i * batch_size
-		end_idx = min(start_idx + batch_size, total_rows)
-		batch_df = final_df.iloc[start_idx:end_idx]
-		batch_file = os.path.join(output_dir, f'batch_{i+1}.tsv')
-		batch_df.to_csv(batch_file, sep='\t', index=False)
-		batch_log[f"batch_{i+1}.tsv"] = batch_df["sample_name"].tolist()
-
-	# Write the JSON batch-to-sample dictionary 
-	summary_path = os.path.join(output_dir, "batch_summary.json")
-	with open(summary_path, "w") as json_file:
-		json.dump(batch_log, json_file, indent=4)
+		for i, (positions, planned_bytes) in enumerate(batches):
+			batch_df = final_df.iloc[positions]
+			batch_name = f"batch_{i+1}.tsv"
+			batch_file = os.path.join(output_dir, batch_name)
+			fingerprint = batch_fingerprint(final_df.columns, row_hashes[positions])
+			state['batches'][batch_name] = fingerprint
+			previous_file = os.path.join(parameters['previous_validation_dir'] or "", "batched_tsvs", batch_name)
+			if previous_batches.get(batch_name) == fingerprint and os.path.exists(previous_file):
+				if not (os.path.exists(batch_file) and os.path.samefile(previous_file, batch_file)):
+					shutil.copyfile(previous_file, batch_file)
+				reused += 1
+			else:
+				batch_df.to_csv(batch_file, sep='\t', index=False)
+			batch_log[batch_name] = {"samples": batch_df["sample_name"].tolist(), "planned_bytes": planned_bytes}
+		if validate_checks.previous_state is not None:
+			print(f"Rewrote {num_batches - reused} batch file(s), {reused} unchanged batch file(s) reused from {parameters['previous_validation_dir']}")
+
+		# Write the JSON batch-to-sample dictionary 
+		summary_path = os.path.join(output_dir, "batch_summary.json")
+		with open(summary_path, "w") as json_file:
+			json.dump(batch_log, json_file, indent=4)
+
+		# Per-row fingerprints and outcomes for the next incremental run
+		with gzip.open(os.path.join(output_dir, STATE_FILE), "wt", compresslevel=1) as f:
+			f.write(json.dumps(state))
+
+	profiler.write("validation_timings.json")
 
 	print(f"\n Metadata successfully split into {num_batches} batch file(s) in {output_dir}.\n")
 	print(f"Summary written to: {summary_path}\n")
+	for line in cache_stats():
+		print(line)
 
 # Will need to move this somewhere else (before GENBANK runs, need to run this check)
 def retrieve_existing_batch_tsvs(filled_df: pd.DataFrame, parameters: dict):
@@ -93,7 +145,8 @@ def retrieve_existing_batch_tsvs(filled_df: pd.DataFrame, parameters: dict):
 	expected_samples = set(filled_df['sample_name'])
 	found_samples = set()
 
-	for batch_file, samples in batch_summary.items():
+	for batch_file, entry in batch_summary.items():
+		samples = batch_samples(entry)
 		src_batch_path = os.path.join(parameters["path_to_existing_tsvs"], "batched_tsvs",	batch_file)
 		dest_batch_path = os.path.join("batched_tsvs", batch_file)
 
@@ -149,11 +202,6 @@ class GetParams:
 			config_dict = yaml.load(f, Loader=yaml.BaseLoader) # Load yaml as str only
 			return config_dict.get("BioSample_package", "Pathogen.cl.1.0") # if no key default to Pathogen.cl.1.0
 	
-	def load_required_fields(self, yaml_path):
-		with open(yaml_path, "r") as f:
-			fields_dict = yaml.load(f, Loader=yaml.SafeLoader)
-		return fields_dict.get("BioSample_packages", {})  # Return the nested dictionary
-
 	@staticmethod
 	def get_args():
 		""" Expected args from user and default values associated with them
@@ -165,6 +213,10 @@ class GetParams:
 		# optional parameters
 		parser.add_argument("--batch_size", type=int, default=1, 
 					  		help="Number of samples to process per batch")
+		parser.add_argument("--max_batch_bytes", type=int, default=0,
+							help="Max bytes of sequence files (FASTQ/FASTA/GFF) per batch, 0 for no limit")
+		parser.add_argument("--path_root", type=str, default=None,
+							help="Directory that relative sequence file paths in the metadata are relative to (default: current directory)")
 		parser.add_argument("-o", "--output_dir", type=str, default='validation_outputs',
 							help="Output Directory for final files, default is current directory")
 		parser.add_argument("--overwrite_output_files", action="store_true", default=True, 
@@ -183,6 +235,18 @@ class GetParams:
 					  		help="Path to submission config file with a valid BioSample_package key")
 		parser.add_argument("--biosample_fields_key", type=str, 
 					  		help="Path to file with BioSample required fields information")
+		parser.add_argument("--workers", type=int, default=1,
+							help="Number of processes for the row-level checks (1 runs everything serially)")
+		parser.add_argument("--previous_validation_dir", type=str, default=None,
+							help="Output directory of a previous validation run; rows and batches that did not change are reused from it")
+		parser.add_argument("--compact", action="store_true", default=False,
+							help="Store repetitive columns (organism, host, instruments, ...) as categoricals to save memory")
+		parser.add_argument("--metadata_cache_dir", type=str, default=None,
+							help="Directory for the cache of parsed metadata sheets (default: no cache)")
+		parser.add_argument("--profile", action="store_true", default=False,
+							help="Write per-stage wall time, CPU time and memory to validation_timings.json")
+		parser.add_argument("--profile_dump_dir", type=str, default=None,
+							help="Also run each stage under cProfile and dump the stats to this directory (implies --profile)")
 		return parser
 
 	def get_restrictions(self):
@@ -205,14 +269,15 @@ class GetParams:
 						   		  "cDNA_randomPriming", "Inverse rRNA", "Oligo-dT", "PolyA", "repeat fractionation"]
 		layout_restrictions =["single", "paired"]
 
-		self.parameters['restricted_terms'] = [strategy_restrictions, source_restrictions,
-											   selection_restrictions, layout_restrictions]
-		self.parameters['illumina_instrument_restrictions'] = ["HiSeq X Five", "HiSeq X Ten", "Illumina Genome Analyzer",
+		# Compiled once into frozen vocabularies (exact set, case-folded lookup and trigram index for suggestions)
+		self.parameters['restricted_terms'] = [Vocabulary(strategy_restrictions), Vocabulary(source_restrictions),
+											   Vocabulary(selection_restrictions), Vocabulary(layout_restrictions)]
+		self.parameters['illumina_instrument_restrictions'] = Vocabulary(["HiSeq X Five", "HiSeq X Ten", "Illumina Genome Analyzer",
 									 "Illumina Genome Analyzer II", "Illumina Genome Analyzer IIx", "Illumina HiScanSQ", "Illumina HiSeq 1000",
 									 "Illumina HiSeq 1500", "Illumina HiSeq 2000", "Illumina HiSeq 2500", "Illumina HiSeq 3000",
 									 "Illumina HiSeq 4000", "Illumina iSeq 100", "Illumina NovaSeq 6000", "Illumina MiniSeq", 
-									 "Illumina MiSeq", "NextSeq 500", "NextSeq 550", "NextSeq 1000", "NextSeq 2000", "Illumina HiSeq X"]
-		self.parameters['nanopore_instrument_restrictions'] = ["GridION", "MinION", "PromethION"]
+									 "Illumina MiSeq", "NextSeq 500", "NextSeq 550", "NextSeq 1000", "NextSeq 2000", "Illumina HiSeq X"])
+		self.parameters['nanopore_instrument_restrictions'] = Vocabulary(["GridION", "MinION", "PromethION"])
 
 
 class GetMetaAsDf:
@@ -225,14 +290,15 @@ class GetMetaAsDf:
 	def load_meta(self):
 		""" Loads the metadata file in as a dataframe from an Excel file (.xlsx)
 		"""
-		df = pd.read_excel(self.parameters['meta_path'], header=[1], dtype = str, engine = "openpyxl", index_col=None, na_filter=False)
+		# The sheet is streamed in chunks (or taken from the parsed-sheet cache when --metadata_cache_dir is set);
+		# duplicate headers and blank sample names are picked up while reading
+		df, reader = read_metadata_sheet(self.parameters['meta_path'], header_row=1, na_filter=False,
+										 cache_dir=self.parameters.get('metadata_cache_dir'),
+										 compact=self.parameters.get('compact', False))
 		df = df.loc[:, ~df.columns.str.contains('^Unnamed')] # Remove "Unnamed" col that sometimes gets imported due to trailing commas
-		# Check for duplicate columns - pandas imports duplicate columns with .1, .2 endings so detect these and return an error if found
-		duplicate_pattern = r"\.\d+$"  # Matches column names ending with .1, .2, etc.
-		mangled_columns = [re.sub(duplicate_pattern, "", col) for col in df.columns if any(re.match(rf"^{re.escape(base)}{duplicate_pattern}$", col) for base in df.columns if base != col)]
-		duplicate_bases = list(set(mangled_columns))
-		if duplicate_bases:
-			raise ValueError(f"Duplicate columns detected in the metadata due to renaming: {duplicate_bases}.\n"
+		# Check for duplicate columns - pandas-style renaming would hide these as .1, .2 columns, so return an error if found
+		if reader.duplicate_columns:
+			raise ValueError(f"Duplicate columns detected in the metadata due to renaming: {reader.duplicate_columns}.\n"
 					"Please check your metadata, remove duplicate columns, and try again.")
 		# Check for empty dataframe
 		if df.empty:
@@ -246,27 +312,112 @@ class GetMetaAsDf:
 			sys.exit(1)
 		
 		# Check for missing sample_name values
-		if df['sample_name'].isnull().any() or (df['sample_name'].str.strip() == "").any():
-			missing_indices = df[df['sample_name'].isnull() | (df['sample_name'].str.strip() == "")].index.tolist()
+		if reader.blank_sample_rows:
+			missing_indices = reader.blank_sample_rows
 			error_message = f"Error: The metadata file contains missing values in the 'sample_name' column at rows: {missing_indices}. Please provide valid sample names."
 			print(error_message, file=sys.stderr)  # Print the error message to stderr
 			sys.exit(1)
 
 		return df
 
+# Smallest shard worth sending to a worker process
+MIN_SHARD_ROWS = 500
+
+# Incremental validation state, written next to batch_summary.json
+STATE_FILE = "validation_state.json.gz"
+def code_fingerprint(paths):
+	""" SHA-256 of the concatenated source files
+	"""
+	digest = hashlib.sha256()
+	for path in paths:
+		with open(path, 'rb') as f:
+			digest.update(f.read())
+	return digest.hexdigest()
+
+# Stored results are only reused by the same validation code
+CODE_FINGERPRINT = code_fingerprint([os.path.abspath(__file__), validation_rules.__file__])
+
+def row_fingerprints(df):
+	""" 64-bit content hash of every row, as hex strings
+	"""
+	return [format(h, '016x') for h in pd.util.hash_pandas_object(df, index=False).to_numpy()]
+
+def batch_fingerprint(columns, row_hashes):
+	""" Hash of a batch's columns and row hashes, i.e. of the TSV it is written to
+	"""
+	digest = hashlib.sha256(json.dumps(list(columns)).encode())
+	digest.update(row_hashes.tobytes())
+	return digest.hexdigest()
+
+def load_validation_state(previous_dir):
+	""" Loads the validation state of a previous run from <previous_dir>/batched_tsvs, or None
+	"""
+	if not previous_dir:
+		return None
+	state_path = os.path.join(previous_dir, "batched_tsvs", STATE_FILE)
+	if not os.path.exists(state_path):
+		print(f"No previous validation state at {state_path}, validating all rows")
+		return None
+	with gzip.open(state_path, "rt") as f:
+		return json.load(f)
+
+def serial_column_order(n_entry_columns, parts, out):
+	""" Column order a serial run of a row phase gives, for out, the concatenation of the phase's row parts
+		Row-local steps keep (or rename in place) the columns they start with and append the ones they create; a
+		column created by a fill appears at the first row that needs it (see RuleEngine.run). A part only holds
+		the created columns its own rows needed, so pd.concat orders those by whichever part comes first. This
+		puts them back in order of the first row holding a value, then of their position in that row's part.
+	"""
+	head = list(parts[0].columns[:n_entry_columns])
+	owner = pd.Series(0, index=out.index)
+	for i, part in enumerate(parts[1:], 1):
+		owner[part.index] = i
+	owner = owner.to_numpy()
+
+	def position(column):
+		present = out[column].notna().to_numpy()
+		if present.any():
+			row = int(present.argmax())
+			return row, parts[owner[row]].columns.get_loc(column)
+		part = next(part for part in parts if column in part.columns)
+		return len(out), part.columns.get_loc(column)
+
+	head_columns = set(head)
+	return head + sorted((column for column in out.columns if column not in head_columns), key=position)
+
+def run_row_steps(checks, steps):
+	""" Runs row-local validation steps on one shard (in a worker process)
+		Returns the shard dataframe and the (global_log, sample_log) of each step
+	"""
+	results = []
+	for step in steps:
+		checks.global_log, checks.sample_log = [], defaultdict(list)
+		with checks.profiler.stage(step):
+			checks.run_step(step)
+		results.append((checks.global_log, checks.sample_log))
+	return checks.metadata_df, results
+
 class ValidateChecks:
 	""" Class constructor for performing a variety of checks on metadata
 	"""
-	def __init__(self, filled_df, parameters, get_params):
+	def __init__(self, filled_df, parameters, get_params, profiler=None):
 		# passed into class constructor
 		self.metadata_df = filled_df
 		self.parameters = parameters
+		self.profiler = profiler or StageProfiler()
 		self.global_log = []
 		self.sample_log = defaultdict(list)  # sample_name -> list of messages
 
+		# Incremental validation: stored results of the previous run, and the state recorded for the next one
+		self.previous_state = load_validation_state(parameters.get('previous_validation_dir'))
+		self.state = {'phases': [], 'batches': {}}
+		# Row results are looked up through their sample, so only track them when sample names are unique
+		self.track_rows = filled_df['sample_name'].is_unique
+
 		# Set required and "at least one" fields dynamically
 		self.biosample_package = get_params.load_config() # get the correct BioSample package
-		self.required_fields_dict = get_params.load_required_fields(parameters['biosample_fields_key'])
+		self.package_schema = load_package_schema(parameters['biosample_fields_key'])
+		self.required_fields_dict = self.package_schema.packages
 		self.at_least_one_required_fields_dict = self.required_fields_dict.get("At_least_one_required", {})
 		self.required_core = self.required_fields_dict.get(self.biosample_package, {}).get("required", [])
 		self.optional_core = self.required_fields_dict.get(self.biosample_package, {}).get("at_least_one_required", [])
@@ -278,36 +429,189 @@ class ValidateChecks:
 	def validate_main(self):
 		""" Main function that performs metadata validation
 		"""
-		# check ncbi-spuid uniqueness
-		self.check_unique_spuid()
+		steps = self.validation_steps()
+		workers = self.parameters.get('workers', 1) or 1
+		self.run_steps(steps, workers)
 
+		# write error file
+		with self.profiler.stage("report_errors"):
+			self.report_errors()
+
+	def validation_steps(self):
+		""" Returns the (step, row_local) pairs to run, in order
+			Row-local steps only look at and change their own rows, so they can run on row shards and be reused
+			for unchanged rows. Whole-frame steps (spuid uniqueness, author cleanup, which stops at the first bad
+			row, required columns and the "at least one" groups in check_meta_core, custom field discovery) always
+			run on the full dataframe.
+		"""
+		# check ncbi-spuid uniqueness
+		steps = [('check_unique_spuid', False)]
 		# checks date
 		if self.parameters['date_format_flag'].lower() != 'o':
-			self.check_date()
-
+			steps.append(('check_date', True))
 		# check authors
-		try:
-			self.check_authors()
-		except:
-			self.global_log.append("\n\t Invalid Author Name, please list as full names separated by ;")
-		
-		# checks required and optional BioSample package fields 
-		self.check_meta_core()
-
+		steps.append(('check_authors', False))
+		# checks required and optional BioSample package fields
+		steps.append(('check_meta_core', False))
 		# removes demographic data if user requested
 		if self.parameters['remove_demographic_info'] is True:
+			steps.append(('check_meta_case', True))
+		# check SRA data fields
+		steps.append(('check_illumina_nanopore', True))
+		# check custom data fields
+		steps.append(('check_custom_fields', False))
+		return steps
+
+	def run_step(self, step):
+		""" Runs one validation step by name
+		"""
+		if step == 'check_authors':
+			try:
+				self.check_authors()
+			except:
+				self.global_log.append("\n\t Invalid Author Name, please list as full names separated by ;")
+		elif step == 'check_meta_case':
 			self.global_log.append(f"\n\t\t'remove_demographic_info' flag is True. Sample demographic data will be removed if present.")
 			self.check_meta_case()
+		elif step == 'check_custom_fields':
+			self.check_custom_fields(self.parameters['custom_fields_file'])
+		else:
+			getattr(self, step)()
 
-		# check SRA data fields
-		self.check_illumina_nanopore()
+	def run_steps(self, steps, workers):
+		""" Runs the steps in order; consecutive row-local steps form a phase that runs through run_row_phase
+			Logs are collected per step and merged in step order, then row order, which is the order a plain
+			serial run appends them in, so error.txt comes out the same however the rows were processed.
+		"""
+		step_logs = []  # per step: (global messages, [sample_log of each row group])
+		executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(self.metadata_df) >= 2 * MIN_SHARD_ROWS else None
+		try:
+			i = 0
+			while i < len(steps):
+				step, row_local = steps[i]
+				if not row_local:
+					self.global_log, self.sample_log = [], defaultdict(list)
+					with self.profiler.stage(step):
+						self.run_step(step)
+					step_logs.append((self.global_log, [self.sample_log]))
+					i += 1
+					continue
+				phase = []
+				while i < len(steps) and steps[i][1]:
+					phase.append(steps[i][0])
+					i += 1
+				step_logs.extend(self.run_row_phase(phase, workers, executor))
+		finally:
+			if executor is not None:
+				executor.shutdown()
+
+		self.global_log, self.sample_log = [], defaultdict(list)
+		for global_log, sample_logs in step_logs:
+			self.global_log.extend(global_log)
+			for sample_log in sample_logs:
+				for sample, messages in sample_log.items():
+					self.sample_log[sample].extend(messages)
+
+	def run_row_phase(self, phase, workers, executor):
+		""" Runs a phase of row-local steps and returns the (global_log, [sample_logs]) of each step
+			Rows whose content at the start of the phase matches a row of the previous run (see
+			--previous_validation_dir) take their resulting values and messages from the stored state;
+			the rest run the steps, split over the process pool when there are enough of them.
+		"""
+		df = self.metadata_df
+		salt = self.phase_salt(phase, df.columns)
+		keys = row_fingerprints(df) if self.track_rows else None
+		previous = self.previous_phase(len(self.state['phases']), phase, salt)
+		if previous is not None:
+			clean = np.array([key in previous['rows'] for key in keys], dtype=bool)
+		else:
+			clean = np.zeros(len(df), dtype=bool)
+
+		results, parts = [], []
+		dirty = df[~clean]
+		if len(dirty):
+			n_shards = min(workers, len(dirty) // MIN_SHARD_ROWS) if executor is not None else 1
+			if n_shards > 1:
+				shards = [self.shard(dirty.iloc[rows[0]:rows[-1] + 1])
+						  for rows in np.array_split(np.arange(len(dirty)), n_shards)]
+				# Steps run interleaved across the workers, so the phase is timed as a whole
+				with self.profiler.stage("+".join(phase)):
+					results = list(executor.map(run_row_steps, shards, [phase] * len(shards)))
+			else:
+				shard = self.shard(dirty)
+				shard.profiler = self.profiler
+				results = [run_row_steps(shard, phase)]
+			parts = [shard_df for shard_df, _ in results]
+		if clean.any():
+			stored = [previous['rows'][key] for key, is_clean in zip(keys, clean) if is_clean]
+			parts.append(pd.DataFrame([row['values'] for row in stored], columns=previous['columns'],
+									  index=df.index[clean], dtype=object))
+			print(f"Reused stored {', '.join(phase)} results for {int(clean.sum())}/{len(df)} unchanged rows")
+
+		out = pd.concat(parts)
+		if clean.any() and len(dirty):
+			out = out.reindex(df.index)  # back to sheet order
+		if len(parts) > 1:
+			out = out[serial_column_order(len(df.columns), parts, out)]
+		self.metadata_df = out
+
+		logs = []
+		for j in range(len(phase)):
+			if results:
+				# Every shard reports the same column-level messages, keep one copy of each
+				global_log = list(results[0][1][j][0])
+				for _, shard_logs in results[1:]:
+					global_log.extend(line for line in shard_logs[j][0] if line not in global_log)
+			else:
+				global_log = list(previous['global'][j])
+			sample_logs = [shard_logs[j][1] for _, shard_logs in results]
+			if clean.any():
+				sample_logs.append({sample: row['messages'][j] for sample, row in zip(df['sample_name'][clean], stored)
+									if row['messages'][j]})
+			logs.append((global_log, sample_logs))
+
+		if keys is not None:
+			# Sample names are unique here, so each row's messages can be looked up by its sample
+			rows = {}
+			for key, sample, values in zip(keys, df['sample_name'], out.to_numpy().tolist()):
+				rows[key] = {
+					'values': values,
+					'messages': [[message for sample_log in sample_logs for message in sample_log.get(sample, [])]
+								 for _, sample_logs in logs]
+				}
+			self.state['phases'].append({
+				'steps': phase, 'salt': salt, 'columns': list(out.columns),
+				'global': [global_log for global_log, _ in logs], 'rows': rows
+			})
+		return logs
+
+	def shard(self, df):
+		""" Copy of these checks working on a subset of the rows (without the incremental state)
+		"""
+		shard = copy.copy(self)
+		shard.metadata_df = df
+		shard.previous_state, shard.state = None, None
+		shard.profiler = StageProfiler()
+		return shard
+
+	def phase_salt(self, phase, columns):
+		""" Fingerprint of everything besides the row content that a phase's result depends on
+		"""
+		settings = {key: self.parameters.get(key) for key in
+					['date_format_flag', 'remove_demographic_info', 'illumina_instrument_restrictions', 'nanopore_instrument_restrictions']}
+		blob = json.dumps([CODE_FINGERPRINT, phase, list(columns), settings], sort_keys=True, default=str)
+		return hashlib.sha256(blob.encode()).hexdigest()
 
-		# check custom data fields
-		self.check_custom_fields(self.parameters['custom_fields_file'])
+	def previous_phase(self, index, phase, salt):
+		""" Stored record for this phase from the previous run, if it was produced under the same settings
+		"""
+		if self.previous_state is None or not self.track_rows:
+			return None
+		phases = self.previous_state.get('phases', [])
+		if index < len(phases) and phases[index]['steps'] == phase and phases[index]['salt'] == salt:
+			return phases[index]
+		return None
 
-		# write error file
-		self.report_errors()
-				
 	def report_errors(self):
 		with open('error.txt', "w") as f:
 			# Write Global Errors
@@ -331,6 +635,11 @@ class ValidateChecks:
 				else:
 					f.write("\t\tPassed all sample checks!\n")
 				f.write("\n")
+
+		# Same messages as one JSONL row each, with the counts in the first line
+		summary = write_report(REPORT_FILE, self.global_log, self.sample_log, self.metadata_df["sample_name"].tolist())
+		print(f"Validation report written to {REPORT_FILE}: {summary['errors']} error(s), {summary['warnings']} warning(s), "
+			  f"{summary['samples_with_errors']}/{summary['samples']} sample(s) with errors")
 		
 	def normalize_author_columns(self):
 		""" Normalize author/authors column to always be 'authors' 
@@ -340,6 +649,7 @@ class ValidateChecks:
 			self.metadata_df.rename(columns={'author': 'authors'}, inplace=True)
 		elif 'authors' in self.metadata_df.columns and 'author' in self.metadata_df.columns:
 			# Merge both columns if they exist, prioritizing 'authors'
+			allow_values(self.metadata_df, 'authors', self.metadata_df['author'])
 			self.metadata_df['authors'] = self.metadata_df['authors'].fillna(self.metadata_df['author'])
 			self.metadata_df.drop(columns=['author'], inplace=True)
 	
@@ -355,10 +665,9 @@ class ValidateChecks:
 			self.global_log.append(
 				f"ERROR: Duplicate ncbi-spuid values found: {set(dup_values)}"
 			)
-			for _, row in duplicates.iterrows():
-				sample = row['sample_name']
-				spuid = row['ncbi-spuid']
-				self.sample_log[sample].append(f"ERROR: Duplicate ncbi-spuid '{spuid}'")
+			RuleEngine([
+				UniqueRule('ncbi-spuid', "ERROR: Duplicate ncbi-spuid '{value}'")
+			]).run(self.metadata_df, self.sample_log)
 
 	def check_date(self):
 		""" Validates and reformats dates based on date_format_flag value
@@ -367,30 +676,35 @@ class ValidateChecks:
 		if flag not in {"v", "s"}:
 			raise ValueError(f"Unknown date_format_flag: {flag}")
 
-		def validate_and_format(row):
-			date_str = str(row['collection_date'])
-			sample = row['sample_name']
-
-			if not date_str or date_str.strip() == "":
-				self.sample_log[sample].append("ERROR: Missing collection_date.")
-				return date_str
+		# Sheets repeat the same handful of dates, so parse each distinct value once
+		# and broadcast the results back onto the rows
+		dates = self.metadata_df['collection_date'].astype(str)
+		codes, uniques = pd.factorize(dates)
+		unique_dates = pd.Series(uniques, dtype=object)
+		parts = unique_dates.str.extract(r"^(?P<year>\d{4})(?:[-/](?P<month>\d{1,2}))?(?:[-/](?P<day>\d{1,2}))?")
 
-			match = re.match(r"^(\d{4})(?:[-/](\d{1,2}))?(?:[-/](\d{1,2}))?", date_str)
-			if not match:
-				self.sample_log[sample].append(f"ERROR: Invalid date format: '{date_str}'")
-				return date_str
+		missing = unique_dates.str.strip() == ""
+		invalid = ~missing & parts['year'].isna()
+		two_digit_year = ~missing & ~invalid & (parts['year'].str.len() == 2)
+		valid = ~(missing | invalid | two_digit_year)
 
-			year, month, day = match.groups()
-			if len(year) == 2:
-				self.sample_log[sample].append(f"ERROR: Year is two digits: '{year}'")
-				return date_str
+		formatted = parts['year'] + "-" + parts['month'].fillna("1").str.zfill(2)
+		if flag == "v":
+			formatted = formatted + "-" + parts['day'].fillna("1").str.zfill(2)
 
-			month = month.zfill(2) if month else "01"
-			day = day.zfill(2) if day else "01"
+		messages = pd.Series(None, index=unique_dates.index, dtype=object)
+		messages[missing] = "ERROR: Missing collection_date."
+		messages[invalid] = "ERROR: Invalid date format: '" + unique_dates[invalid] + "'"
+		messages[two_digit_year] = "ERROR: Year is two digits: '" + parts['year'][two_digit_year] + "'"
 
-			return f"{year}-{month}-{day}" if flag == "v" else f"{year}-{month}"
+		# Log the failing rows in bulk, in row order
+		row_messages = messages.to_numpy()[codes]
+		failed = ~valid.to_numpy()[codes]
+		for sample, message in zip(self.metadata_df['sample_name'].to_numpy()[failed], row_messages[failed]):
+			self.sample_log[sample].append(message)
 
-		self.metadata_df["collection_date"] = self.metadata_df.apply(validate_and_format, axis=1)
+		normalized = formatted.where(valid, unique_dates).to_numpy()[codes]
+		self.metadata_df["collection_date"] = pd.Series(normalized, index=self.metadata_df.index, dtype=object)
 
 	def check_authors(self):
 		"""Checks and reformats the 'authors' column to ensure consistent First Last or F.M. Last format.
@@ -398,36 +712,11 @@ class ValidateChecks:
 		if 'authors' not in self.metadata_df.columns:
 			self.global_log.append("No 'authors' column found in metadata.")
 			return
-		
-		def fix_name(raw_name):
-			# Remove digits and leading/trailing whitespace
-			cleaned = ''.join([char for char in raw_name if not char.isdigit()]).strip()
-
-			# Remove unwanted tokens/characters
-			for token in ['...', 'Name:', 'author', ',', 'dtype:', ':', 'object', '\\', '/']:
-				cleaned = cleaned.replace(token, '')
-			parts = cleaned.split()
-
-			# Convert First Middle Last to F.M. Last
-			if len(parts) == 3 and len(parts[0]) > 1:
-				new_name = f"{parts[0][0]}.{parts[1][0]}. {parts[2]}"
-				return new_name if (new_name.count('.') == 2 and len(new_name.split()) == 2) else cleaned
-
-		# Apply to the full dataframe
-		for idx, row in self.metadata_df.iterrows():
-			raw = row.get('authors', '')
-			if pd.isna(raw) or str(raw).strip() == '':
-				continue  # Skip if authors field is empty or NaN
-
-			raw_authors = str(raw).split(';')
-			cleaned_authors = [fix_name(author.strip()) for author in raw_authors if author.strip()]
-			fixed_authors_str = '; '.join(cleaned_authors)
-
-			# Optional logging if the cleaned string differs from original
-			if fixed_authors_str != row.get('authors', ''):
-				sample_name = row.get('sample_name', f'Row {idx}')
-				self.sample_log[sample_name].append("Author names were cleaned and reformatted.")
-				self.metadata_df.at[idx, 'authors'] = fixed_authors_str
+
+		# Empty authors fields are skipped; rewritten values are logged per sample
+		RuleEngine([
+			TransformRule('authors', lambda raw: clean_author_list(str(raw)), "Author names were cleaned and reformatted.")
+		]).run(self.metadata_df, self.sample_log)
 
 	
 	def check_meta_core(self):
@@ -446,6 +735,7 @@ class ValidateChecks:
 			if field in self.metadata_df.columns:
 				missing_mask = self.metadata_df[field].isna() | (self.metadata_df[field].astype(str).str.strip() == "")
 				if missing_mask.any():
+					allow_values(self.metadata_df, field, ["Not Provided"])
 					self.metadata_df.loc[missing_mask, field] = "Not Provided"
 					for sample_name in self.metadata_df.loc[missing_mask, 'sample_name']:
 						self.sample_log[sample_name].append(f"WARNING: {field} is missing for sample {sample_name}, setting to 'Not Provided'\n")
@@ -469,6 +759,7 @@ class ValidateChecks:
 				if group_missing.any():
 					for field in group_in_df:
 						empty_field_mask = group_values[field] == ""
+						allow_values(self.metadata_df, field, ["Not Provided"])
 						self.metadata_df.loc[empty_field_mask, field] = "Not Provided"
 						for sample_name in self.metadata_df.loc[empty_field_mask, 'sample_name']:
 							self.sample_log[sample_name].append(
@@ -483,25 +774,12 @@ class ValidateChecks:
 
 		# Check lat_lon field
 		if 'lat_lon' in self.metadata_df.columns:
-			for _, row in self.metadata_df.iterrows():
-				sample_name = row.get('sample_name', 'UNKNOWN_SAMPLE')
-				latlon_val = row.get('lat_lon', '')
-				if not self._valid_latlon(latlon_val):
-					self.sample_log[sample_name].append(
-						f"WARNING: lat_lon looks misformatted: '{latlon_val}' (expected 'lat lon')\n"
-					)
-
-	def _valid_latlon(self, s: str) -> bool:
-		"""Return True if s is a valid 'latitude longitude' string in decimal degrees."""
-		try:
-			lat_str, lon_str = map(str.strip, s.split())
-			lat = float(lat_str)
-			lon = float(lon_str)
+			# Must be 'latitude longitude' in decimal degrees
+			RuleEngine([
+				NumericRangeRule('lat_lon', [(-90, 90), (-180, 180)],
+					"WARNING: lat_lon looks misformatted: '{value}' (expected 'lat lon')\n")
+			]).run(self.metadata_df, self.sample_log)
 
-			return -90 <= lat <= 90 and -180 <= lon <= 180
-		except (ValueError, AttributeError):
-			return False
-	
 	def check_meta_case(self):
 		"""Checks and removes demographics metadata for cases (sex, age, race, and ethnicity) if present.
 		"""
@@ -513,18 +791,21 @@ class ValidateChecks:
 					field_values = self.metadata_df[field].astype(str).str.strip()
 					invalid_mask[field] = ~field_values.isin(["", "None", "Not Provided"])
 
-			rows_with_invalid = invalid_mask.any(axis=1)
+			rows_with_invalid = invalid_mask.any(axis=1).to_numpy()
+			sample_names = self.metadata_df['sample_name'].to_numpy()[rows_with_invalid]
 
-			for idx in self.metadata_df[rows_with_invalid].index:
-				sample_name = self.metadata_df.at[idx, "sample_name"]
-				fields_to_clean = [field for field in self.case_fields if invalid_mask.at[idx, field]]
+			for sample_name, row in zip(sample_names, invalid_mask.to_numpy()[rows_with_invalid]):
+				fields_to_clean = [field for field, invalid in zip(self.case_fields, row) if invalid]
+				self.sample_log[sample_name].append(
+					f"Present Case Data found in: {', '.join(fields_to_clean)}. "
+					f"The case data has been removed automatically."
+				)
 
-				if fields_to_clean:
-					self.sample_log[sample_name].append(
-						f"Present Case Data found in: {', '.join(fields_to_clean)}. "
-						f"The case data has been removed automatically."
-					)
-					self.metadata_df.loc[idx, fields_to_clean] = "Not Provided"
+			# Clear each field in one assignment
+			for field in self.case_fields:
+				if invalid_mask[field].any():
+					allow_values(self.metadata_df, field, ["Not Provided"])
+					self.metadata_df.loc[invalid_mask[field], field] = "Not Provided"
 		
 		except Exception as e:
 			self.global_log.append(f"Unexpected error during case metadata check: {str(e)}")
@@ -544,65 +825,26 @@ class ValidateChecks:
 			'nanopore_sra_file_path_1': 'int_nanopore_sra_file_path_1',
 		}, inplace=True)
 
-		required_illumina = [
-			"illumina_sequencing_instrument",
-			"illumina_library_strategy",
-			"illumina_library_source",
-			"illumina_library_selection",
-			"illumina_library_layout",
-			"illumina_library_name"
-		]
-
-		required_nanopore = [
-			"nanopore_sequencing_instrument",
-			"nanopore_library_strategy",
-			"nanopore_library_source",
-			"nanopore_library_selection",
-			"nanopore_library_layout",
-			"nanopore_library_name"
-		]
-
-		for idx, row in self.metadata_df.iterrows():
-			sample_name = row["sample_name"]
-			illumina_found = bool(row.get("int_illumina_sra_file_path_1")) and bool(row.get("int_illumina_sra_file_path_2"))
-			nanopore_found = bool(row.get("int_nanopore_sra_file_path_1"))
-
-			# Illumina check
-			if illumina_found:
-				for field in required_illumina:
-					if not row.get(field):  # missing or empty
-						self.metadata_df.at[idx, field] = "Not Provided"
-						self.sample_log[sample_name].append(f"INFO: Filled missing {field} with 'Not Provided'")
-				
-				illumina_invalid = []
-				if row.get("illumina_library_layout") == "paired" and not row.get("int_illumina_sra_file_path_2"):
-					illumina_invalid.append("int_illumina_sra_file_path_2 (missing for paired layout)")
-				if row.get("illumina_sequencing_instrument") not in self.parameters.get("illumina_instrument_restrictions", []):
-					illumina_invalid.append("illumina_sequencing_instrument (invalid or missing)")
-				if illumina_invalid:
-					self.sample_log[sample_name].append(
-						f"ERROR: Illumina metadata is incomplete or invalid. Issues: {', '.join(set(illumina_invalid))}"
-					)
-			else:
-				self.sample_log[sample_name].append("INFO: Illumina Not Found")
-
-			# Nanopore check
-			if nanopore_found:
-				for field in required_nanopore:
-					if not row.get(field):  # missing or empty
-						self.metadata_df.at[idx, field] = "Not Provided"
-						self.sample_log[sample_name].append(f"INFO: Filled missing {field} with 'Not Provided'")
-
-				nanopore_invalid = []
-				if row.get("nanopore_sequencing_instrument") not in self.parameters.get("nanopore_instrument_restrictions", []):
-					nanopore_invalid.append("nanopore_sequencing_instrument (invalid or missing)")
-
-				if nanopore_invalid:
-					self.sample_log[sample_name].append(
-						f"ERROR: Nanopore metadata is incomplete or invalid. Issues: {', '.join(set(nanopore_invalid))}"
-					)
-			else:
-				self.sample_log[sample_name].append("INFO: Nanopore Not Found")
+		rules = []
+		for platform in ['illumina', 'nanopore']:
+			# Illumina needs both reads, Nanopore needs one file
+			file_columns = [f'int_{platform}_sra_file_path_1']
+			if platform == 'illumina':
+				file_columns.append('int_illumina_sra_file_path_2')
+			label = platform.capitalize()
+			required_fields = [f"{platform}_{field}" for field in
+				["sequencing_instrument", "library_strategy", "library_source", "library_selection", "library_layout", "library_name"]]
+
+			for field in required_fields:
+				rules.append(RequiredIfPresentRule(field, "INFO: Filled missing {field} with 'Not Provided'",
+					if_present=file_columns, fill_value="Not Provided"))
+			rules.append(AllowedValuesRule(f"{platform}_sequencing_instrument",
+				self.parameters.get(f"{platform}_instrument_restrictions", []),
+				f"ERROR: {label} metadata is incomplete or invalid. Issues: {platform}_sequencing_instrument (invalid or missing)",
+				if_present=file_columns, suggest=True))
+			rules.append(RequiredIfPresentRule(file_columns, f"INFO: {label} Not Found"))
+
+		RuleEngine(rules).run(self.metadata_df, self.sample_log)
 
 	def check_custom_fields(self, json_path: str):
 		"""Validate and process custom fields defined in a JSON config.
@@ -620,19 +862,8 @@ class ValidateChecks:
 			if 'test_field' not in k.lower()
 		}
 
-		static_columns = {
-			"sample_name", "sequence_name", "ncbi-spuid", "ncbi-bioproject", "title", "description",
-			"authors", "submitting_lab", "submitting_lab_division", "submitting_lab_address", "publication_status", "publication_title",
-			"isolate", "isolation_source", "host_disease", "host", "organism", "collection_date", "country", "state",
-			"collected_by", "sample_type", "lat_lon", "purpose_of_sampling", "host_sex", "host_age", "race", "ethnicity",
-			"assembly_protocol", "assembly_method", "mean_coverage", "fasta_path", "gff_path", "ncbi-spuid-sra",
-			"illumina_sequencing_instrument", "illumina_library_strategy", "illumina_library_source", "illumina_library_selection",
-			"illumina_library_layout", "illumina_library_protocol", "illumina_library_name", "illumina_sra_file_path_1", "illumina_sra_file_path_2",
-			"file_location", "fastq_path_1", "fastq_path_2", "nanopore_sequencing_instrument", "nanopore_library_strategy",
-			"nanopore_library_source", "nanopore_library_selection", "nanopore_library_layout", "nanopore_library_protocol",
-			"nanopore_library_name", "nanopore_sra_file_path_1", "nanopore_sra_file_path_2",
-			"int_illumina_sra_file_path_1", "int_illumina_sra_file_path_2","int_nanopore_sra_file_path_1", "int_nanopore_sra_file_path_2"
-		}
+		# standard template columns of the BioSample fields key
+		static_columns = self.package_schema.role_columns("static")
 
 		existing_cols = set(self.metadata_df.columns)
 		unexpected_fields = existing_cols - static_columns - set(custom_fields)
@@ -643,6 +874,7 @@ class ValidateChecks:
 
 			# Replace empty values
 			if 'replace_empty_with' in props and field in self.metadata_df.columns:
+				allow_values(self.metadata_df, field, [props['replace_empty_with']])
 				self.metadata_df[field].fillna(props['replace_empty_with'], inplace=True)
 
 			# Rename field
@@ -677,53 +909,76 @@ class ValidateChecks:
 				return None
 		return val
 
+	def normalize_values(self, df):
+		""" Applies normalize_value to every cell, one column at a time
+			Same output as df.applymap(self.normalize_value). String columns (strings and nulls only) are cleaned
+			once per distinct value and mapped back. Numeric and boolean columns hold nothing to clean and are kept
+			as they are, except all-NaN columns, which come out as all None. Categorical columns (--compact) stay
+			categorical, with their categories cleaned. Anything else (e.g. a column mixing strings and numbers)
+			goes through normalize_value cell by cell.
+		"""
+		columns = []
+		for i in range(df.shape[1]):
+			values = df.iloc[:, i]
+			if isinstance(values.dtype, pd.CategoricalDtype):
+				# Categories that clean up to the same value are merged, the ones that become empty turn into nulls
+				new_codes, categories = pd.factorize(pd.Series([self.normalize_value(c) for c in values.cat.categories], dtype=object))
+				codes = np.append(new_codes, -1)[values.cat.codes.to_numpy()]
+				columns.append(pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=values.index))
+				continue
+			if values.dtype.kind in "biuf":
+				if values.dtype.kind == "f" and len(values) and values.isna().all():
+					values = pd.Series(np.full(len(values), None, dtype=object), index=values.index)
+				columns.append(values)
+				continue
+			kind = pd.api.types.infer_dtype(values, skipna=True) if values.dtype == object else None
+			if kind not in ("string", "empty"):
+				columns.append(values.map(self.normalize_value))
+				continue
+			# Sheets repeat the same few values down a column, so each distinct string is cleaned once
+			codes, uniques = pd.factorize(values)
+			cleaned = np.empty(len(uniques) + 1, dtype=object)  # the last slot (code -1, nulls) stays None
+			cleaned[:-1] = [self.normalize_value(value) for value in uniques]
+			columns.append(pd.Series(cleaned[codes], index=values.index))
+		normalized = pd.concat(columns, axis=1) if columns else df.copy()
+		normalized.columns = df.columns
+		return normalized
+
+def geo_loc_name(df):
+	""" 'country: state', or just the country where the state is empty
+	"""
+	country = df['country'].astype(str)
+	if 'state' not in df.columns:
+		return country
+	has_state = validation_rules.is_present(df, 'state')
+	return country.where(~has_state, country + ": " + df['state'].astype(str))
+
 class HandleDfInserts:
 	""" Class constructor for handling the insert operations on the metadata df once all the checks are completed
 	"""
+	# Columns computed from the validated metadata, in insertion order
+	derived_columns = [
+		DerivedColumn("geo_loc_name", geo_loc_name, requires=["country"]),
+		DerivedColumn("structuredcomment", lambda df: "Assembly-Data", overwrite=False)
+	]
+
 	def __init__(self, filled_df, parameters):
 		self.parameters = parameters
 		self.metadata_df = filled_df
-		self.list_of_country = self.metadata_df["country"].tolist() if "country" in self.metadata_df.columns else []
-		self.list_of_state = self.metadata_df["state"].tolist() if "state" in self.metadata_df.columns else []
-		self.new_combination_list = []
 
 	def handle_df_inserts(self):
-		""" Main function to call sub-insert routines and return the final metadata dataframe
+		""" Main function to add the derived columns and return the final metadata dataframe
 		"""
-		# adds the Geolocation field
-		if self.list_of_country:
-			self.insert_loc_data()
-		self.insert_additional_columns()
+		for column in self.derived_columns:
+			column.apply(self.metadata_df)
 		try:
-			assert 'geo_loc_name' in self.metadata_df.columns.values
-			assert True not in [math.isnan(x) for x in self.metadata_df['geo_loc_name'].tolist() if isinstance(x, str) is False]
-			assert 'structuredcomment' in self.metadata_df.columns.values
-			assert True not in [math.isnan(x) for x in self.metadata_df['structuredcomment'].tolist() if isinstance(x, str) is False]
+			for column in self.derived_columns:
+				assert column.name in self.metadata_df.columns
+				assert not self.metadata_df[column.name].isna().any()
 		except AssertionError:
 			raise AssertionError(f'Columns were not properly inserted into dataframe')
 		return self.metadata_df
 
-	def insert_loc_data(self):
-		""" Inserts modified location data with the country:state into dataframe
-		"""
-		for i in range(len(self.list_of_country)):
-			if i < len(self.list_of_state) and self.list_of_state[i] not in ("", None):
-				self.new_combination_list.append(f'{self.list_of_country[i]}: {self.list_of_state[i]}')
-			else:
-				self.new_combination_list.append(str(self.list_of_country[i]))
-
-		self.metadata_df['geo_loc_name'] = self.new_combination_list
-
-	def insert_additional_columns(self):
-		""" Inserts additional columns into the metadata dataframe if they don't exist
-		"""
-		additional_columns = {
-        "structuredcomment": ["Assembly-Data"] * len(self.metadata_df.index)
-    	}
-		for col_name, col_values in additional_columns.items():
-			if col_name not in self.metadata_df.columns:
-				self.metadata_df.insert(self.metadata_df.shape[1], col_name, col_values)
-
 
 if __name__ == "__main__":
 	metadata_validation_main()
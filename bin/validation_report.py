@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Structured report of the metadata validation messages
+# Each message of the validation logs becomes one JSONL row (sample, field, severity, code, message). The first line
+# of the file is a summary record with the counts, so gating steps only need to read one line.
+
+import re
+import sys
+import json
+from functools import lru_cache
+
+REPORT_FILE = "validation_report.jsonl"
+
+# (pattern, code, field) for the messages ValidateChecks writes; a named group 'field' in the pattern overrides field
+MESSAGE_CODES = [
+	# sample messages
+	(r"ERROR: Missing collection_date", "missing_collection_date", "collection_date"),
+	(r"ERROR: Invalid date format", "invalid_date_format", "collection_date"),
+	(r"ERROR: Year is two digits", "two_digit_year", "collection_date"),
+	(r"ERROR: Duplicate ncbi-spuid '", "duplicate_spuid", "ncbi-spuid"),
+	(r"Author names were cleaned", "authors_reformatted", "authors"),
+	(r"WARNING: (?P<field>\S+) is missing for sample", "required_field_filled", None),
+	(r"WARNING: (?P<field>\S+) in optional group is missing", "optional_field_filled", None),
+	(r"WARNING: lat_lon looks misformatted", "invalid_lat_lon", "lat_lon"),
+	(r"Present Case Data found in: (?P<field>[^.]+)\.", "case_data_removed", None),
+	(r"INFO: Filled missing (?P<field>\S+) with", "sra_field_filled", None),
+	(r"ERROR: (Illumina|Nanopore) metadata is incomplete or invalid\. Issues: (?P<field>\S+)", "invalid_sequencing_instrument", None),
+	(r"INFO: Illumina Not Found", "no_illumina_files", "illumina_sra_file_path_1"),
+	(r"INFO: Nanopore Not Found", "no_nanopore_files", "nanopore_sra_file_path_1"),
+	# global messages
+	(r"ERROR: Metadata is missing required column 'ncbi-spuid'", "missing_spuid_column", "ncbi-spuid"),
+	(r"ERROR: Duplicate ncbi-spuid values found", "duplicate_spuid", "ncbi-spuid"),
+	(r"No 'authors' column found", "missing_authors_column", "authors"),
+	(r"Invalid Author Name", "invalid_author_name", "authors"),
+	(r"Missing required fields: (?P<field>.+)", "missing_required_fields", None),
+	(r"Missing optional field groups", "missing_optional_field_groups", None),
+	(r"'remove_demographic_info' flag is True", "demographic_info_removed", None),
+	(r"Unexpected error during case metadata check", "case_check_failed", None),
+	(r"\[CustomFields\] Error loading JSON", "custom_fields_unreadable", None),
+	(r"\[CustomFields\] Issues in '(?P<field>[^']+)'", "custom_field_issue", None),
+	(r"\[CustomFields\] Unexpected fields in metadata", "unexpected_custom_fields", None),
+]
+COMPILED_CODES = [(re.compile(pattern), code, field) for pattern, code, field in MESSAGE_CODES]
+
+
+@lru_cache(maxsize=None)
+def classify(message):
+	""" Returns (severity, code, field) for a validation message
+		Severity follows the gate used on error.txt: any message mentioning ERROR is an error.
+	"""
+	if "ERROR" in message:
+		severity = "error"
+	elif "WARNING" in message:
+		severity = "warning"
+	else:
+		severity = "info"
+	for pattern, code, field in COMPILED_CODES:
+		match = pattern.match(message)
+		if match:
+			return severity, code, match.groupdict().get('field', field)
+	return severity, "unclassified", None
+
+
+def build_report(global_log, sample_log, samples):
+	""" Turns the validation logs into (summary, rows); samples is the sheet's sample names in row order
+	"""
+	rows = []
+	for line in global_log:
+		message = line.strip()
+		severity, code, field = classify(message)
+		rows.append({"sample": None, "field": field, "severity": severity, "code": code, "message": message})
+
+	samples_with_errors = 0
+	for sample in dict.fromkeys(samples):
+		has_error = False
+		for line in sample_log.get(sample, []):
+			message = line.strip()
+			severity, code, field = classify(message)
+			has_error = has_error or severity == "error"
+			rows.append({"sample": sample, "field": field, "severity": severity, "code": code, "message": message})
+		samples_with_errors += has_error
+
+	counts = {severity: 0 for severity in ["error", "warning", "info"]}
+	for row in rows:
+		counts[row["severity"]] += 1
+	summary = {
+		"status": "ERROR" if counts["error"] else "OK",
+		"samples": len(samples),
+		"samples_with_errors": samples_with_errors,
+		"errors": counts["error"],
+		"warnings": counts["warning"],
+		"info": counts["info"],
+		"global_errors": sum(1 for row in rows if row["sample"] is None and row["severity"] == "error")
+	}
+	return summary, rows
+
+
+def write_report(path, global_log, sample_log, samples):
+	""" Writes the JSONL report: a {"summary": ...} line followed by one line per message
+	"""
+	summary, rows = build_report(global_log, sample_log, samples)
+	with open(path, "w") as f:
+		f.write(json.dumps({"summary": summary}) + "\n")
+		for row in rows:
+			f.write(json.dumps(row) + "\n")
+	return summary
+
+
+def read_summary(path):
+	""" Reads only the summary line of a report
+	"""
+	with open(path) as f:
+		return json.loads(f.readline())["summary"]
+
+
+if __name__ == "__main__":
+	# Prints the gate status (ERROR / OK) of a report, used by CHECK_VALIDATION_ERRORS
+	print(read_summary(sys.argv[1])["status"], end="")
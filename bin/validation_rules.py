@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+# Columnar rule engine used by validate_metadata.py
+# Each rule compiles to a boolean mask over the whole metadata dataframe; the engine evaluates
+# every mask once and then writes the per-sample log in a single grouped pass
+
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Smallest trigram similarity (Jaccard) for a term to be offered as a "did you mean" suggestion
+MIN_SUGGESTION_SIMILARITY = 0.3
+
+
+def is_present(df, column):
+	""" Boolean mask of rows where the column holds a non-empty value (a missing column counts as empty)
+	"""
+	if column not in df.columns:
+		return pd.Series(False, index=df.index)
+	values = df[column]
+	return values.notna() & (values.astype(str) != "")
+
+
+def allow_values(df, column, values):
+	""" Makes values assignable to a categorical column (compact mode) by adding them as categories
+		A no-op for plain columns, so it can guard every write of new values into the metadata.
+	"""
+	if column not in df.columns or not isinstance(df[column].dtype, pd.CategoricalDtype):
+		return
+	new_values = pd.Index(pd.unique(pd.Series(values, dtype=object).dropna())).difference(df[column].cat.categories, sort=False)
+	if len(new_values):
+		df[column] = df[column].cat.add_categories(new_values)
+
+
+def trigrams(text):
+	""" Set of character trigrams of a case-folded, space-padded string
+	"""
+	padded = f"  {text.casefold()} "
+	return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Vocabulary:
+	""" Frozen list of allowed terms, compiled for fast lookups
+
+		Membership is exact (a plain frozenset, usable with Series.isin). A case-folded map and a trigram index
+		back suggest(), which proposes the closest term for a bad value by only looking at terms that share
+		a trigram with it.
+	"""
+	def __init__(self, terms):
+		self.terms = tuple(dict.fromkeys(terms))
+		self.exact = frozenset(self.terms)
+		self.folded = {term.casefold(): term for term in self.terms}
+		self.term_trigrams = {term: trigrams(term) for term in self.terms}
+		index = defaultdict(list)
+		for term, grams in self.term_trigrams.items():
+			for gram in grams:
+				index[gram].append(term)
+		self.trigram_index = {gram: tuple(terms) for gram, terms in index.items()}
+
+	def __contains__(self, value):
+		return value in self.exact
+
+	def __iter__(self):
+		return iter(self.terms)
+
+	def __len__(self):
+		return len(self.terms)
+
+	def __repr__(self):
+		return f"Vocabulary({list(self.terms)!r})"
+
+	def isin(self, values):
+		""" Boolean mask of the values that are allowed terms
+		"""
+		return values.isin(self.exact)
+
+	def suggest(self, value):
+		""" Closest allowed term to value, or None if nothing is close enough
+		"""
+		if not isinstance(value, str) or not value.strip():
+			return None
+		value = value.strip()
+		if value.casefold() in self.folded:
+			return self.folded[value.casefold()]
+		grams = trigrams(value)
+		shared = Counter(term for gram in grams for term in self.trigram_index.get(gram, ()))
+		best, best_score = None, MIN_SUGGESTION_SIMILARITY
+		for term, count in shared.items():
+			score = count / (len(grams) + len(self.term_trigrams[term]) - count)
+			if score > best_score:
+				best, best_score = term, score
+		return best
+
+
+class Rule:
+	""" Base class for a validation rule
+
+		field: column the rule checks (its value is available to the message as {value})
+		message: format string for the sample log, may use {sample}, {field} and {value}
+		if_present: the rule only applies to rows where all of these columns are non-empty
+		fill_value: if set, rows that fail the rule get this value written into field
+	"""
+	def __init__(self, field, message, if_present=None, fill_value=None):
+		self.field = field
+		self.message = message
+		self.if_present = if_present or []
+		self.fill_value = fill_value
+		self.error = None
+
+	def violations(self, df):
+		""" Returns a boolean mask of rows that fail the rule; implemented by each rule type
+		"""
+		raise NotImplementedError
+
+	def applies_to(self, df):
+		mask = pd.Series(True, index=df.index)
+		for column in self.if_present:
+			mask &= is_present(df, column)
+		return mask
+
+	def evaluate(self, df):
+		return self.applies_to(df) & self.violations(df)
+
+	def render(self, df, mask):
+		""" Builds the log message for every failing row
+		"""
+		count = int(mask.sum())
+		if "{" not in self.message:
+			return [self.message] * count
+		samples = df.loc[mask, 'sample_name']
+		values = df.loc[mask, self.field] if self.field in df.columns else [None] * count
+		return [self.message.format(sample=sample, field=self.field, value=value) for sample, value in zip(samples, values)]
+
+	def fix(self, df, mask):
+		if self.fill_value is not None:
+			allow_values(df, self.field, [self.fill_value])
+			df.loc[mask, self.field] = self.fill_value
+
+
+class RequiredIfPresentRule(Rule):
+	""" Fails rows where field is missing or empty; field can also be a list of columns that must all be filled
+	"""
+	def __init__(self, field, message, if_present=None, fill_value=None):
+		self.fields = [field] if isinstance(field, str) else list(field)
+		super().__init__(self.fields[0], message, if_present, fill_value)
+
+	def violations(self, df):
+		mask = pd.Series(False, index=df.index)
+		for column in self.fields:
+			mask |= ~is_present(df, column)
+		return mask
+
+
+class AllowedValuesRule(Rule):
+	""" Fails rows whose value is not one of the allowed terms (missing values fail too)
+		allowed is compiled into a Vocabulary; with suggest=True the message for a value close to an allowed
+		term ends with a "did you mean" hint.
+	"""
+	def __init__(self, field, allowed, message, if_present=None, fill_value=None, suggest=False):
+		super().__init__(field, message, if_present, fill_value)
+		self.allowed = allowed if isinstance(allowed, Vocabulary) else Vocabulary(allowed)
+		self.suggest = suggest
+
+	def violations(self, df):
+		if self.field not in df.columns:
+			return pd.Series(True, index=df.index)
+		return ~self.allowed.isin(df[self.field])
+
+	def render(self, df, mask):
+		messages = super().render(df, mask)
+		if not self.suggest or self.field not in df.columns:
+			return messages
+		# One lookup per distinct bad value
+		suggestions = {}
+		for i, value in enumerate(df.loc[mask, self.field]):
+			if value not in suggestions:
+				suggestions[value] = self.allowed.suggest(value)
+			if suggestions[value] is not None:
+				messages[i] = f"{messages[i]} - did you mean '{suggestions[value]}'?"
+		return messages
+
+
+class NumericRangeRule(Rule):
+	""" Fails rows whose value is not numeric or falls outside [min, max]
+		With several ranges the value must be that many whitespace-separated numbers (e.g. 'lat lon')
+	"""
+	def __init__(self, field, ranges, message, if_present=None, fill_value=None):
+		super().__init__(field, message, if_present, fill_value)
+		self.ranges = ranges
+
+	def violations(self, df):
+		if self.field not in df.columns:
+			return pd.Series(True, index=df.index)
+		parts = df[self.field].astype(str).str.split()
+		valid = parts.str.len() == len(self.ranges)
+		for i, (minimum, maximum) in enumerate(self.ranges):
+			numbers = pd.to_numeric(parts.str[i], errors='coerce')
+			valid &= numbers.between(minimum, maximum)
+		return ~valid
+
+
+class RegexRule(Rule):
+	""" Fails rows whose value does not fully match the pattern (missing values fail too)
+	"""
+	def __init__(self, field, pattern, message, if_present=None, fill_value=None):
+		super().__init__(field, message, if_present, fill_value)
+		self.pattern = pattern
+
+	def violations(self, df):
+		if self.field not in df.columns:
+			return pd.Series(True, index=df.index)
+		matches = df[self.field].astype(str).str.fullmatch(self.pattern)
+		return ~matches.fillna(False).astype(bool)
+
+
+class UniqueRule(Rule):
+	""" Fails every row whose value appears more than once in the column
+	"""
+	def violations(self, df):
+		if self.field not in df.columns:
+			return pd.Series(False, index=df.index)
+		return df.duplicated(subset=[self.field], keep=False)
+
+
+class TransformRule(Rule):
+	""" Rewrites non-blank values with transform and fails the rows whose value changed
+		transform runs once per distinct value. If it raises, rows from the first failing one onwards
+		are left untouched and the error is raised by the engine once the earlier rows are logged,
+		matching what a row-by-row loop would have done.
+	"""
+	def __init__(self, field, transform, message, if_present=None):
+		super().__init__(field, message, if_present)
+		self.transform = transform
+		self.transformed = None
+
+	def violations(self, df):
+		self.error = None
+		if self.field not in df.columns:
+			return pd.Series(False, index=df.index)
+		values = df[self.field].astype(object)  # compared with the transformed values as plain strings
+		candidates = values.notna() & (values.astype(str).str.strip() != "")
+		mapping = {}
+		for value in pd.unique(values[candidates]):  # in order of first appearance
+			try:
+				mapping[value] = self.transform(value)
+			except Exception as e:
+				self.error = e
+				first_failure = np.flatnonzero((values == value).to_numpy())[0]
+				candidates &= np.arange(len(values)) < first_failure
+				break
+		self.transformed = values.map(mapping)
+		return candidates & (self.transformed != values)
+
+	def fix(self, df, mask):
+		allow_values(df, self.field, self.transformed[mask])
+		df.loc[mask, self.field] = self.transformed[mask]
+
+
+class DerivedColumn:
+	""" A column computed from the validated metadata with a column expression
+
+		compute: function of the dataframe returning a Series (or a scalar for a constant column)
+		requires: columns that must exist for the column to be derived
+		overwrite: replace an existing column of the same name; otherwise an existing column is kept
+	"""
+	def __init__(self, name, compute, requires=None, overwrite=True):
+		self.name = name
+		self.compute = compute
+		self.requires = requires or []
+		self.overwrite = overwrite
+
+	def apply(self, df):
+		""" Adds or replaces the column in df (new columns go at the end); returns whether it was written
+		"""
+		if any(column not in df.columns for column in self.requires):
+			return False
+		if self.name in df.columns and not self.overwrite:
+			return False
+		df[self.name] = self.compute(df)
+		return True
+
+
+class RuleEngine:
+	""" Evaluates a list of rules over the metadata dataframe and logs the failures per sample
+	"""
+	def __init__(self, rules):
+		self.rules = rules
+
+	def run(self, df, sample_log):
+		""" Evaluates every rule, applies fills/rewrites, and extends sample_log
+			Messages for a sample come out in row order, then in rule order, like a row loop would produce.
+			Returns the list of masks (one per rule).
+		"""
+		# Evaluate all masks before fixing anything so every rule sees the original values
+		masks = [rule.evaluate(df) for rule in self.rules]
+
+		entries = []
+		for order, (rule, mask) in enumerate(zip(self.rules, masks)):
+			if mask.any():
+				entries.append(pd.DataFrame({
+					'position': np.flatnonzero(mask.to_numpy()),
+					'order': order,
+					'message': rule.render(df, mask)
+				}))
+
+		existing = set(df.columns)
+		for rule, mask in zip(self.rules, masks):
+			if mask.any():
+				rule.fix(df, mask)
+		# A row loop creates a missing column at the first row it fills, so put new columns in that order
+		created = [column for column in df.columns if column not in existing]
+		if len(created) > 1:
+			first_row = {column: int(df[column].notna().to_numpy().argmax()) for column in created}
+			for column in sorted(created, key=lambda column: (first_row[column], created.index(column))):
+				df[column] = df.pop(column)
+
+		if entries:
+			log = pd.concat(entries, ignore_index=True).sort_values(['position', 'order'], kind='stable')
+			log['sample'] = df['sample_name'].to_numpy()[log['position'].to_numpy()]
+			for sample, messages in log.groupby('sample', sort=False)['message']:
+				sample_log[sample].extend(messages.tolist())
+
+		for rule in self.rules:
+			if rule.error is not None:
+				raise rule.error
+		return masks
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# Streaming writer for submission.xml
+# Produces the same bytes as serializing the whole tree with ElementTree, reparsing it with minidom and calling
+# toprettyxml(indent="  "), but each top-level block (Description, every Action) is written out as soon as it is
+# complete, so memory stays flat however many samples a batch has.
+# Blocks that repeat for every sample can be compiled once into an XMLTemplate: the parts that only depend on the
+# submission config are rendered at compile time and each sample only fills in its fields.
+
+import os
+import xml.etree.ElementTree as ET
+
+INDENT = "  "
+# Tag of the placeholder element standing for a run of per-sample leaf elements (see Block)
+BLOCK_TAG = "__block__"
+
+
+def escape_text(text):
+	""" Text as minidom writes it after the round trip (line ends normalized by the parser)
+	"""
+	text = text.replace("\r\n", "\n").replace("\r", "\n")
+	return text.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def escape_attribute(value):
+	""" Attribute value as minidom writes it (ElementTree keeps CR, LF and tab intact through the round trip)
+	"""
+	return value.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def write_element(write, element, indent=""):
+	""" Writes an ElementTree element in minidom's toprettyxml layout
+	"""
+	write(f"{indent}<{element.tag}")
+	for name, value in element.attrib.items():
+		write(f' {name}="{escape_attribute(value)}"')
+	# minidom sees the element's text, then every child followed by its tail, as separate nodes
+	nodes = [element.text] if element.text else []
+	for child in element:
+		nodes.append(child)
+		if child.tail:
+			nodes.append(child.tail)
+	if not nodes:
+		write("/>\n")
+	elif len(nodes) == 1 and isinstance(nodes[0], str):
+		write(f">{escape_text(nodes[0])}</{element.tag}>\n")
+	else:
+		write(">\n")
+		for node in nodes:
+			if isinstance(node, str):
+				write(f"{indent}{INDENT}{escape_text(node)}\n")
+			else:
+				write_element(write, node, indent + INDENT)
+		write(f"{indent}</{element.tag}>\n")
+
+
+class Field:
+	""" Placeholder for a per-sample value, used as the text of a template element or as an attribute value
+		The text of an element with a Field must be its only content; an empty value gives '<Tag/>' like minidom.
+	"""
+	def __init__(self, name):
+		self.name = name
+
+
+def Block(parent, name):
+	""" Adds a placeholder for a run of per-sample leaf elements, filled with (tag, attributes, text) tuples
+		If the placeholders are all the parent has, an empty run collapses the parent to '<Parent/>'.
+	"""
+	return ET.SubElement(parent, BLOCK_TAG, {"name": name})
+
+
+def write_leaf(write, tag, attrib, text, indent):
+	""" Writes an element without children, the same way write_element would
+	"""
+	write(f"{indent}<{tag}")
+	for name, value in attrib.items():
+		write(f' {name}="{escape_attribute(value)}"')
+	write(f">{escape_text(text)}</{tag}>\n" if text else "/>\n")
+
+
+class XMLTemplate:
+	""" An element compiled into static text plus slots for its Fields and Blocks
+		render() joins the precomputed text with the escaped field values, so the invariant parts of a block are
+		built and escaped once per batch instead of once per sample.
+	"""
+	def __init__(self, element, indent=INDENT):
+		self.parts = []  # str, or (kind, name, ...) slots
+		self.static = []
+		self.compile(element, indent)
+		self.flush()
+
+	def flush(self):
+		if self.static:
+			self.parts.append("".join(self.static))
+			self.static = []
+
+	def slot(self, *slot):
+		self.flush()
+		self.parts.append(slot)
+
+	def compile(self, element, indent):
+		self.static.append(f"{indent}<{element.tag}")
+		for name, value in element.attrib.items():
+			if isinstance(value, Field):
+				self.static.append(f' {name}="')
+				self.slot("attribute", value.name)
+				self.static.append('"')
+			else:
+				self.static.append(f' {name}="{escape_attribute(value)}"')
+		children = list(element)
+		if isinstance(element.text, Field):
+			if children:
+				raise ValueError(f"Field {element.text.name} must be the only content of <{element.tag}>")
+			self.slot("text", element.text.name, element.tag)
+		elif children and not element.text and all(child.tag == BLOCK_TAG for child in children):
+			# Whether the parent is empty is only known once the runs are filled in
+			self.slot("container", [child.get("name") for child in children], element.tag, indent)
+		elif children:
+			if element.text or any(child.tail for child in children):
+				raise ValueError(f"Templates do not support mixed content in <{element.tag}>")
+			self.static.append(">\n")
+			for child in children:
+				if child.tag == BLOCK_TAG:
+					self.slot("run", child.get("name"), indent + INDENT)
+				else:
+					self.compile(child, indent + INDENT)
+			self.static.append(f"{indent}</{element.tag}>\n")
+		elif element.text:
+			self.static.append(f">{escape_text(element.text)}</{element.tag}>\n")
+		else:
+			self.static.append("/>\n")
+
+	def render(self, fields=None, blocks=None):
+		""" Returns the block's text; fields maps Field names to strings, blocks maps Block names to leaf tuples
+		"""
+		fields = fields or {}
+		blocks = blocks or {}
+		out = []
+		write = out.append
+		for part in self.parts:
+			if isinstance(part, str):
+				write(part)
+			elif part[0] == "attribute":
+				write(escape_attribute(fields[part[1]]))
+			elif part[0] == "text":
+				text = fields[part[1]]
+				write(f">{escape_text(text)}</{part[2]}>\n" if text else "/>\n")
+			elif part[0] == "run":
+				for tag, attrib, text in blocks.get(part[1], ()):
+					write_leaf(write, tag, attrib, text, part[2])
+			else:
+				names, tag, indent = part[1:]
+				leaves = [leaf for name in names for leaf in blocks.get(name, ())]
+				if not leaves:
+					write("/>\n")
+					continue
+				write(">\n")
+				for leaf_tag, attrib, text in leaves:
+					write_leaf(write, leaf_tag, attrib, text, indent + INDENT)
+				write(f"{indent}</{tag}>\n")
+		return "".join(out)
+
+
+class StreamingXMLWriter:
+	""" Writes a document one top-level child at a time
+		The file is written under a temporary name and only appears at path once close() succeeds.
+	"""
+	def __init__(self, path, root_tag="Submission"):
+		self.path = path
+		self.root_tag = root_tag
+		self.tmp_path = f"{path}.{os.getpid()}.tmp"
+		self.file = open(self.tmp_path, "w", encoding="utf-8")
+		self.file.write('<?xml version="1.0" ?>\n')
+		self.children = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if exc_type is None:
+			self.close()
+		else:
+			self.abort()
+
+	def write(self, element):
+		""" Writes a complete child of the root element
+		"""
+		if not self.children:
+			self.file.write(f"<{self.root_tag}>\n")
+		write_element(self.file.write, element, INDENT)
+		self.children += 1
+
+	def write_rendered(self, text):
+		""" Writes a child of the root element already rendered at the child's indent (e.g. by an XMLTemplate)
+		"""
+		if not self.children:
+			self.file.write(f"<{self.root_tag}>\n")
+		self.file.write(text)
+		self.children += 1
+
+	def close(self):
+		self.file.write(f"</{self.root_tag}>\n" if self.children else f"<{self.root_tag}/>\n")
+		self.file.close()
+		os.replace(self.tmp_path, self.path)
+
+	def abort(self):
+		self.file.close()
+		if os.path.exists(self.tmp_path):
+			os.remove(self.tmp_path)
@@ -10,17 +10,14 @@ process CHECK_VALIDATION_ERRORS {
         'docker.io/staphb/tostadas:latest' : 'docker.io/staphb/tostadas:latest' }"
 
     input:
-    path error_file
+    path validation_report
 
     output:
     stdout emit: status
 
     script:
+    // The first line of the report holds the summary counts, no need to scan the messages
     """
-    if grep -q "ERROR" $error_file; then
-        echo -n "ERROR"
-    else
-        echo -n "OK"
-    fi
+    validation_report.py $validation_report
     """ 
 }
\ No newline at end of file
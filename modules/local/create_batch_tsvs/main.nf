@@ -15,10 +15,13 @@ process CREATE_BATCH_TSVS {
 
     output:
     path "*.tsv", emit: tsv_files
+    path "genbank_batch_summary.json", emit: summary
 
     script:
+    def compact = params.compact_metadata == true ? '--compact' : ''
+    def metadata_cache = params.metadata_cache_dir ? "--metadata_cache_dir ${params.metadata_cache_dir}" : ''
     """
-    create_batch_tsvs.py --input $xlsx_file --batch_size $batch_size --output_prefix "genbank"
+    create_batch_tsvs.py --input $xlsx_file --batch_size $batch_size --max_batch_bytes $params.max_batch_bytes --path_root ${workflow.launchDir} --output_prefix "genbank" $compact $metadata_cache
     """
 }
 
@@ -18,10 +18,12 @@ process JOIN_ACCESSIONS_WITH_METADATA {
         path "${params.metadata_basename}_updated.xlsx", emit: updated_excel
 
     script:
+        def compact = params.compact_metadata == true ? '--compact' : ''
         """
         join_accessions_with_metadata.py \
         --metadata_tsv ${validated_metadata_tsv} \
         --submission_report ${aggregated_csv} \
-        --output ${params.metadata_basename}_updated.xlsx
+        --output ${params.metadata_basename}_updated.xlsx \
+        $compact
         """
 }
\ No newline at end of file
@@ -11,15 +11,24 @@ process METADATA_VALIDATION {
 
     input:
     path meta_path
+    path previous_validation_dir, stageAs: 'previous_validation'
    
     output:
     path "batched_tsvs/*.tsv", emit: tsv_files
     path "batched_tsvs/batch_summary.json", optional: true, emit: json
+    path "batched_tsvs/validation_state.json.gz", optional: true, emit: state
     path "error.txt", optional: true, emit: errors
+    path "validation_report.jsonl", emit: report
+    path "validation_timings.json", optional: true, emit: timings
     
     script:
         def remove_demographic_info = params.remove_demographic_info == true ? '--remove_demographic_info' : ''
         def validate_custom_fields = params.validate_custom_fields == true ? '--validate_custom_fields' : ''
+        def profile = params.validation_profile == true ? '--profile' : ''
+        def compact = params.compact_metadata == true ? '--compact' : ''
+        def metadata_cache = params.metadata_cache_dir ? "--metadata_cache_dir ${params.metadata_cache_dir}" : ''
+        // Unchanged rows and batches are reused from the previous run's outputs, when the workflow stages them
+        def previous_validation = previous_validation_dir ? "--previous_validation_dir ${previous_validation_dir}" : ''
 
         // Resolve submission_config path
         def resolved_submission_config = params.submission_config.startsWith('/') ? params.submission_config : "${baseDir}/${params.submission_config}"
@@ -28,11 +37,15 @@ process METADATA_VALIDATION {
         validate_metadata.py \
             --meta_path $meta_path \
             --batch_size $params.batch_size \
+            --max_batch_bytes $params.max_batch_bytes \
+            --path_root ${workflow.launchDir} \
             --output_dir . \
             --custom_fields_file $params.custom_fields_file \
             --date_format_flag $params.date_format_flag \
             $remove_demographic_info $validate_custom_fields \
             --config_file $resolved_submission_config \
-            --biosample_fields_key $params.biosample_fields_key
+            --biosample_fields_key $params.biosample_fields_key \
+            --workers $params.validation_workers \
+            $previous_validation $profile $compact $metadata_cache
         """
 }
\ No newline at end of file
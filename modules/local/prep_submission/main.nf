@@ -29,6 +29,7 @@ process PREP_SUBMISSION {
     def sra = "sra" in enabledDatabases ? '--sra' : ''
     def genbank = "genbank" in enabledDatabases ? '--genbank' : ''
     def wastewater = params.biosample_pkg == 'wastewater' ? '--wastewater' : ''
+    def compact = params.compact_metadata == true ? '--compact' : ''
 
     // Assemble per-sample arguments, quoting paths in case of spaces
     def sample_args_list = samples.collect { sample ->
@@ -52,6 +53,7 @@ process PREP_SUBMISSION {
         --metadata_file ${meta.batch_tsv} \
         --identifier ${params.metadata_basename} \
         --species $params.organism_type \
+        --biosample_fields_key $params.biosample_fields_key \
         --outdir  ${meta.batch_id} \
         ${sample_args} \
         --submission_mode $params.submission_mode \
@@ -59,6 +61,7 @@ process PREP_SUBMISSION {
         $send_submission_email \
         $sra $biosample $genbank \
         $wastewater \
+        $compact \
         $dry_run
     """
 }
\ No newline at end of file
@@ -5,32 +5,24 @@
 */
 
 process REBATCH_METADATA {
+
+    conda(params.env_yml)
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'docker.io/staphb/tostadas:latest' : 'docker.io/staphb/tostadas:latest' }"
+
     input:
         path full_tsv
         path batch_summary_json
 
     output:
         tuple path("*.tsv"), path("*.json"), emit: rebatch_tuple
-    
+
     script:
+    // Updates are BioSample submissions, so BioSample is always the only enabled database, whatever params.biosample is
     """
-    python3 <<'EOF'
-    import pandas as pd, json, os, sys
-    full = pd.read_csv("${full_tsv}", sep="\\t")
-    summary = json.load(open("${batch_summary_json}"))
-
-    for batch_file, sample_list in summary.items():
-        batch_id = os.path.splitext(batch_file)[0]
-        #outdir = f"${params.outdir}/"
-        #os.makedirs(outdir, exist_ok=True)
-        #rebatch_tsv = f"{outdir}/{batch_file}"
-        full[full["sample_name"].isin(sample_list)].to_csv(batch_file, sep="\t", index=False)
-        meta = {"batch_id": batch_id, "batch_tsv": batch_file}
-        samples = [ {"sample_id": sid} for sid in sample_list ]
-        enabled = ["biosample"]
-        
-        with open(f"{batch_id}.json", "w") as f:
-            json.dump({"meta": meta, "samples": samples, "enabled": enabled}, f)
-    EOF
+    rebatch_metadata.py \
+        --full_tsv ${full_tsv} \
+        --batch_summary ${batch_summary_json} \
+        --biosample
     """
-}
\ No newline at end of file
+}
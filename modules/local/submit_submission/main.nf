@@ -17,11 +17,13 @@ process SUBMIT_SUBMISSION {
     output:
     tuple val(meta), path("${meta.batch_id}"), emit: submission_batch_folder
     path("${meta.batch_id}/submission.log"), emit: submission_log, optional: true
+    path("${meta.batch_id}/transfer_metrics.json"), emit: transfer_metrics, optional: true
 
     script:
     def test_flag = params.prod_submission == false ? '--test' : ''
     def send_submission_email = params.send_submission_email == true ? '--send_email' : ''
     def dry_run = params.dry_run == true ? '--dry_run' : ''
+    def checksum = params.upload_checksum == true ? '--checksum' : ''
 
     """
     submission.py \
@@ -30,6 +32,8 @@ process SUBMIT_SUBMISSION {
         --config_file ${submission_config}  \
         --identifier ${params.metadata_basename} \
         --submission_mode ${params.submission_mode} \
+        --upload_streams ${params.upload_streams} \
+        $checksum \
         $test_flag \
         $send_submission_email \
         $dry_run 
@@ -12,23 +12,8 @@ process WRITE_VALIDATED_FULL_TSV {
 
     script:
     """
-
-    python3 - <<'EOF'
-    import pandas as pd
-
-    files = ${validated_tsvs.collect{ '"' + it + '"' }.join(', ')}
-    output = "validated_metadata_all_samples.tsv"
-
-    dfs = []
-    for i, f in enumerate([${validated_tsvs.collect{ '"' + it + '"' }.join(', ')}]):
-        if i == 0:
-            df = pd.read_csv(f, sep="\\t", dtype=str)
-        else:
-            df = pd.read_csv(f, sep="\\t", dtype=str, header=0)
-        dfs.append(df)
-
-    final_df = pd.concat(dfs, ignore_index=True)
-    final_df.to_csv(output, sep="\\t", index=False)
-    EOF
+    concat_tsvs.py \
+        --output validated_metadata_all_samples.tsv \
+        ${validated_tsvs.collect{ '"' + it + '"' }.join(' ')}
     """
 }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark ValidateChecks.check_date against the previous row-wise implementation
+on synthetic metadata sheets.
+
+Usage: benchmark_check_date.py [--rows 1000 10000 100000] [--repeats 3]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "bin"))
+from validate_metadata import ValidateChecks  # noqa: E402
+
+DATES = ["2021-03-04", "2021/3/4", "2021", "2021-3", "", "abc", "21-03-04", "2023/11/9"]
+
+
+def make_frame(n_rows):
+    return pd.DataFrame({
+        "sample_name": [f"sample_{i}" for i in range(n_rows)],
+        "collection_date": [DATES[i % len(DATES)] for i in range(n_rows)],
+    })
+
+
+def make_checks(df, flag):
+    checks = ValidateChecks.__new__(ValidateChecks)
+    checks.metadata_df = df
+    checks.parameters = {"date_format_flag": flag}
+    checks.sample_log = defaultdict(list)
+    checks.global_log = []
+    return checks
+
+
+def legacy_check_date(checks):
+    """ Row-wise implementation that check_date replaced, kept here as the baseline """
+    flag = checks.parameters["date_format_flag"]
+
+    def validate_and_format(row):
+        date_str = str(row['collection_date'])
+        sample = row['sample_name']
+        if not date_str or date_str.strip() == "":
+            checks.sample_log[sample].append("ERROR: Missing collection_date.")
+            return date_str
+        match = re.match(r"^(\d{4})(?:[-/](\d{1,2}))?(?:[-/](\d{1,2}))?", date_str)
+        if not match:
+            checks.sample_log[sample].append(f"ERROR: Invalid date format: '{date_str}'")
+            return date_str
+        year, month, day = match.groups()
+        month = month.zfill(2) if month else "01"
+        day = day.zfill(2) if day else "01"
+        return f"{year}-{month}-{day}" if flag == "v" else f"{year}-{month}"
+
+    checks.metadata_df["collection_date"] = checks.metadata_df.apply(validate_and_format, axis=1)
+
+
+def best_of(func, df, flag, repeats):
+    timings = []
+    for _ in range(repeats):
+        checks = make_checks(df.copy(), flag)
+        start = time.perf_counter()
+        func(checks)
+        timings.append(time.perf_counter() - start)
+    return min(timings), checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collection_date validation")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--flag", choices=["s", "v"], default="s")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'row-wise (s)':>14} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        legacy_time, legacy = best_of(legacy_check_date, df, args.flag, args.repeats)
+        new_time, new = best_of(ValidateChecks.check_date, df, args.flag, args.repeats)
+        # Both implementations must agree before the timings mean anything
+        assert legacy.metadata_df["collection_date"].equals(new.metadata_df["collection_date"])
+        assert legacy.sample_log == new.sample_log
+        print(f"{n_rows:>8} {legacy_time:>14.4f} {new_time:>15.4f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark metadata validation with and without --compact on a large synthetic sheet.
+
+Each mode runs validate_metadata.py --profile in its own process, so the peak RSS
+of one run does not leak into the other, and parses the sheet (no --metadata_cache_dir).
+The batch TSVs of both runs must match.
+
+Usage: benchmark_compact_metadata.py [--rows 20000] [--sheet big.xlsx] [--workdir DIR]
+"""
+
+import os
+import sys
+import json
+import filecmp
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+from openpyxl import Workbook
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+TEMPLATE = os.path.join(REPO, "assets", "sample_metadata", "mpxv_test_metadata.xlsx")
+
+
+def make_sheet(path, n_rows):
+    """ Repeats the rows of the MPXV test sheet, with unique sample names, SPUIDs and file paths """
+    template = pd.read_excel(TEMPLATE, header=1, dtype=str, na_filter=False)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Metadata benchmark sheet"])
+    sheet.append(list(template.columns))
+    unique_columns = {"sample_name", "ncbi-spuid", "ncbi-spuid-sra", "sequence_name", "illumina_library_name",
+                      "illumina_sra_file_path_1", "illumina_sra_file_path_2", "nanopore_sra_file_path_1",
+                      "fasta_path", "gff_path"}
+    rows = template.to_dict(orient="records")
+    for i in range(n_rows):
+        row = dict(rows[i % len(rows)])
+        for column in unique_columns & row.keys():
+            if row[column]:
+                row[column] = f"{row[column]}_{i}"
+        sheet.append([row[column] for column in template.columns])
+    workbook.save(path)
+
+
+def run_validation(sheet, outdir, extra_args):
+    os.makedirs(outdir, exist_ok=True)
+    cmd = [sys.executable, os.path.join(REPO, "bin", "validate_metadata.py"),
+           "--meta_path", sheet, "--batch_size", "1000", "--profile",
+           "--custom_fields_file", os.path.join(REPO, "assets", "custom_meta_fields", "example_custom_fields.json"),
+           "--config_file", os.path.join(REPO, "conf", "submission_config.yaml"),
+           "--biosample_fields_key", os.path.join(REPO, "assets", "biosample_fields_key.yaml")] + extra_args
+    subprocess.run(cmd, cwd=outdir, check=True, stdout=subprocess.DEVNULL)
+    with open(os.path.join(outdir, "validation_timings.json")) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compact (categorical) metadata mode")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--sheet", help="Existing sheet to use instead of generating one")
+    parser.add_argument("--workdir", help="Directory for the sheet and the outputs (default: a temporary one)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="compact_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    sheet = args.sheet
+    if sheet is None:
+        sheet = os.path.join(workdir, f"metadata_{args.rows}.xlsx")
+        if not os.path.exists(sheet):
+            print(f"Writing a {args.rows}-row sheet to {sheet}")
+            make_sheet(sheet, args.rows)
+
+    timings = {}
+    for mode, extra_args in [("default", []), ("compact", ["--compact"])]:
+        timings[mode] = run_validation(sheet, os.path.join(workdir, mode), extra_args)
+
+    # Both modes must write the same batches before the numbers mean anything
+    batch_dirs = [os.path.join(workdir, mode, "batched_tsvs") for mode in timings]
+    batch_files = sorted(name for name in os.listdir(batch_dirs[0]) if name.endswith(".tsv"))
+    _, mismatch, errors = filecmp.cmpfiles(*batch_dirs, batch_files, shallow=False)
+    assert not mismatch and not errors, f"batch files differ: {mismatch + errors}"
+
+    print(f"{'stage':>24} {'default RSS (MB)':>17} {'compact RSS (MB)':>17} {'default (s)':>12} {'compact (s)':>12}")
+    for default, compact in zip(timings["default"]["stages"], timings["compact"]["stages"]):
+        print(f"{default['stage'][:24]:>24} {default['peak_rss_mb']:>17.1f} {compact['peak_rss_mb']:>17.1f} "
+              f"{default['wall_s']:>12.2f} {compact['wall_s']:>12.2f}")
+    default, compact = timings["default"]["total"], timings["compact"]["total"]
+    print(f"{'total':>24} {default['peak_rss_mb']:>17.1f} {compact['peak_rss_mb']:>17.1f} "
+          f"{default['wall_s']:>12.2f} {compact['wall_s']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
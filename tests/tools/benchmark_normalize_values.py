@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark ValidateChecks.normalize_values against the previous
+DataFrame.applymap(normalize_value) on synthetic wide and tall metadata frames.
+
+Usage: benchmark_normalize_values.py [--wide 120 5000] [--tall 20 100000] [--repeats 3]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "bin"))
+from validate_metadata import ValidateChecks  # noqa: E402
+
+warnings.filterwarnings("ignore")  # applymap is deprecated in newer pandas
+
+VALUES = ["Homo sapiens", " USA ", "2021-03", "", "  ", "Not Provided", "Illumina MiSeq", " ", None, "12.5 -45.1"]
+
+
+def make_frame(n_columns, n_rows, seed=0):
+    """ Mostly string columns like a validated sheet, plus a few numeric and empty ones """
+    rng = random.Random(seed)
+    columns = {}
+    for i in range(n_columns):
+        if i % 10 == 8:
+            columns[f"numeric_{i}"] = np.where(np.arange(n_rows) % 7 == 0, np.nan, np.arange(n_rows, dtype=float))
+        elif i % 10 == 9:
+            columns[f"empty_{i}"] = [np.nan] * n_rows
+        else:
+            choices = [rng.choice(VALUES) for _ in range(50)]
+            columns[f"field_{i}"] = [choices[j % 50] for j in range(n_rows)]
+    return pd.DataFrame(columns)
+
+
+def best_of(func, df, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def assert_identical(expected, actual):
+    assert list(expected.columns) == list(actual.columns)
+    assert list(expected.dtypes) == list(actual.dtypes)
+    assert expected.equals(actual)
+    for i in range(expected.shape[1]):
+        # None and NaN compare equal in equals(), the batch TSVs only match if the cell types match too
+        assert list(map(type, expected.iloc[:, i])) == list(map(type, actual.iloc[:, i]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metadata value normalization")
+    parser.add_argument("--wide", type=int, nargs=2, default=[120, 5000], metavar=("COLUMNS", "ROWS"))
+    parser.add_argument("--tall", type=int, nargs=2, default=[20, 100000], metavar=("COLUMNS", "ROWS"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    checks = ValidateChecks.__new__(ValidateChecks)
+    print(f"{'frame':>6} {'columns':>8} {'rows':>8} {'applymap (s)':>13} {'vectorized (s)':>15} {'speedup':>8}")
+    for name, (n_columns, n_rows) in [("wide", args.wide), ("tall", args.tall)]:
+        df = make_frame(n_columns, n_rows)
+        legacy_time, legacy = best_of(lambda frame: frame.applymap(checks.normalize_value), df, args.repeats)
+        new_time, new = best_of(checks.normalize_values, df, args.repeats)
+        # Both implementations must agree before the timings mean anything
+        assert_identical(legacy, new)
+        print(f"{name:>6} {n_columns:>8} {n_rows:>8} {legacy_time:>13.4f} {new_time:>15.4f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark writing a BioSample submission.xml with the streaming writer against
+the previous ET.tostring + minidom.toprettyxml serialization, across batch sizes.
+
+All three build the same BioSample Action blocks; the previous approach keeps them
+all in one tree and pretty-prints it at the end, the streaming writer writes each
+block as it is built, and the template writer compiles the block once and only
+fills in the per-sample values. Peak memory is measured with tracemalloc.
+
+Usage: benchmark_submission_xml.py [--sizes 100 1000 5000] [--attributes 40]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import xml.dom.minidom as minidom
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "bin"))
+from xml_writer import StreamingXMLWriter, XMLTemplate, Field, Block  # noqa: E402
+
+
+def description_block():
+    description = ET.Element("Description")
+    ET.SubElement(description, "Comment").text = "Batch submission"
+    organization = ET.SubElement(description, "Organization", {"role": "owner", "type": "institute"})
+    ET.SubElement(organization, "Name").text = "Benchmark Lab"
+    return description
+
+
+def action_block(i, n_attributes):
+    """ A BioSample Action block shaped like BiosampleSubmission.add_action_block + add_attributes_block """
+    action = ET.Element("Action")
+    add_data = ET.SubElement(action, "AddData", {"target_db": "BioSample"})
+    data = ET.SubElement(add_data, "Data", {"content_type": "xml"})
+    biosample = ET.SubElement(ET.SubElement(data, "XmlContent"), "BioSample", {"schema_version": "2.0"})
+    ET.SubElement(ET.SubElement(biosample, "SampleId"), "SPUID", {"spuid_namespace": "BENCH"}).text = f"SAMPLE_{i}"
+    ET.SubElement(ET.SubElement(biosample, "Descriptor"), "Title").text = "Benchmark sample & co"
+    ET.SubElement(ET.SubElement(biosample, "Organism"), "OrganismName").text = "Monkeypox virus"
+    ET.SubElement(ET.SubElement(biosample, "BioProject"), "PrimaryId", {"db": "BioProject"}).text = "PRJNA000000"
+    ET.SubElement(biosample, "Package").text = "Pathogen.cl.1.0"
+    attributes = ET.SubElement(biosample, "Attributes")
+    for j in range(n_attributes):
+        ET.SubElement(attributes, "Attribute", {"attribute_name": f"field_{j}"}).text = f"value {i} <{j}>"
+    ET.SubElement(ET.SubElement(add_data, "Identifier"), "SPUID", {"spuid_namespace": "BENCH"}).text = f"SAMPLE_{i}"
+    return action
+
+
+def action_template():
+    """ The same Action block with its per-sample values left as fields, compiled once """
+    action = ET.Element("Action")
+    add_data = ET.SubElement(action, "AddData", {"target_db": "BioSample"})
+    data = ET.SubElement(add_data, "Data", {"content_type": "xml"})
+    biosample = ET.SubElement(ET.SubElement(data, "XmlContent"), "BioSample", {"schema_version": "2.0"})
+    ET.SubElement(ET.SubElement(biosample, "SampleId"), "SPUID", {"spuid_namespace": "BENCH"}).text = Field("spuid")
+    ET.SubElement(ET.SubElement(biosample, "Descriptor"), "Title").text = "Benchmark sample & co"
+    ET.SubElement(ET.SubElement(biosample, "Organism"), "OrganismName").text = "Monkeypox virus"
+    ET.SubElement(ET.SubElement(biosample, "BioProject"), "PrimaryId", {"db": "BioProject"}).text = "PRJNA000000"
+    ET.SubElement(biosample, "Package").text = "Pathogen.cl.1.0"
+    Block(ET.SubElement(biosample, "Attributes"), "attributes")
+    ET.SubElement(ET.SubElement(add_data, "Identifier"), "SPUID", {"spuid_namespace": "BENCH"}).text = Field("spuid")
+    return XMLTemplate(action)
+
+
+def write_minidom(path, n_samples, n_attributes):
+    root = ET.Element("Submission")
+    root.append(description_block())
+    for i in range(n_samples):
+        root.append(action_block(i, n_attributes))
+    pretty_xml = minidom.parseString(ET.tostring(root, encoding="utf-8")).toprettyxml(indent="  ")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pretty_xml)
+
+
+def write_streaming(path, n_samples, n_attributes):
+    with StreamingXMLWriter(path) as writer:
+        writer.write(description_block())
+        for i in range(n_samples):
+            writer.write(action_block(i, n_attributes))
+
+
+def write_template(path, n_samples, n_attributes):
+    template = action_template()
+    with StreamingXMLWriter(path) as writer:
+        writer.write(description_block())
+        for i in range(n_samples):
+            attributes = [("Attribute", {"attribute_name": f"field_{j}"}, f"value {i} <{j}>") for j in range(n_attributes)]
+            writer.write_rendered(template.render({"spuid": f"SAMPLE_{i}"}, {"attributes": attributes}))
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming submission.xml generation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--attributes", type=int, default=40)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="xml_benchmark_")
+    print(f"{'samples':>8} {'minidom (s)':>12} {'minidom (MB)':>13} {'streaming (s)':>14} {'streaming (MB)':>15}"
+          f" {'template (s)':>13} {'template (MB)':>14}")
+    for n_samples in args.sizes:
+        old_path = os.path.join(workdir, f"minidom_{n_samples}.xml")
+        new_path = os.path.join(workdir, f"streaming_{n_samples}.xml")
+        template_path = os.path.join(workdir, f"template_{n_samples}.xml")
+        old_time, old_peak = measure(write_minidom, old_path, n_samples, args.attributes)
+        new_time, new_peak = measure(write_streaming, new_path, n_samples, args.attributes)
+        template_time, template_peak = measure(write_template, template_path, n_samples, args.attributes)
+        # All must write the same bytes before the numbers mean anything
+        with open(old_path, "rb") as old, open(new_path, "rb") as new, open(template_path, "rb") as template:
+            expected = old.read()
+            assert expected == new.read(), f"streaming output differs for {n_samples} samples"
+            assert expected == template.read(), f"template output differs for {n_samples} samples"
+        print(f"{n_samples:>8} {old_time:>12.2f} {old_peak:>13.1f} {new_time:>14.2f} {new_peak:>15.1f}"
+              f" {template_time:>13.2f} {template_peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
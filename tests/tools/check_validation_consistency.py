@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Check that metadata validation writes the same outputs however the rows are processed.
+
+The sheet has no illumina_library_layout / nanopore_library_layout columns, its first half is
+nanopore-only and its second half illumina-only, so the "Not Provided" fills create those columns
+in different row shards. The batch TSVs and error.txt of a --workers 1 run must match those of a
+--workers N run.
+
+A run that loads the sheet from a warm parsed-sheet cache (--metadata_cache_dir) must also match.
+
+Then one nanopore row is turned into an illumina one, and an incremental run of the changed sheet
+(--previous_validation_dir pointing at the first run) must write the same outputs as a full run.
+
+The rule types of the columnar engine are also checked on a small frame (RegexRule has no caller in
+ValidateChecks yet, so this is where its behavior is pinned down).
+
+Usage: check_validation_consistency.py [--rows 3000] [--workers 3] [--workdir DIR]
+"""
+
+import os
+import sys
+import shutil
+import filecmp
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+from openpyxl import Workbook
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, os.path.join(REPO, "bin"))
+from validation_rules import RuleEngine, RegexRule  # noqa: E402
+
+TEMPLATE = os.path.join(REPO, "assets", "sample_metadata", "mpxv_test_metadata.xlsx")
+DROPPED_COLUMNS = ["illumina_library_layout", "nanopore_library_layout"]
+ILLUMINA_PATHS = ["illumina_sra_file_path_1", "illumina_sra_file_path_2"]
+NANOPORE_PATHS = ["nanopore_sra_file_path_1"]
+
+
+def write_sheet(path, n_rows, illumina_rows=()):
+    """ Repeats the rows of the MPXV test sheet with unique names and paths: nanopore-only, then illumina-only
+        Rows listed in illumina_rows are illumina-only wherever they are.
+    """
+    template = pd.read_excel(TEMPLATE, header=1, dtype=str, na_filter=False)
+    columns = [column for column in template.columns if column not in DROPPED_COLUMNS]
+    unique_columns = {"sample_name", "ncbi-spuid", "ncbi-spuid-sra", "sequence_name", "illumina_library_name",
+                      "fasta_path", "gff_path"}
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Metadata consistency sheet"])
+    sheet.append(columns)
+    rows = template.to_dict(orient="records")
+    for i in range(n_rows):
+        row = dict(rows[i % len(rows)])
+        for column in unique_columns & row.keys():
+            if row[column]:
+                row[column] = f"{row[column]}_{i}"
+        nanopore = i < n_rows // 2 and i not in illumina_rows
+        for column in ILLUMINA_PATHS:
+            row[column] = "" if nanopore else f"reads/{i}_{column[-1]}.fastq.gz"
+        for column in NANOPORE_PATHS:
+            row[column] = f"reads/{i}_ont.fastq.gz" if nanopore else ""
+        sheet.append([row[column] for column in columns])
+    workbook.save(path)
+
+
+def run_validation(sheet, outdir, extra_args):
+    os.makedirs(outdir, exist_ok=True)
+    cmd = [sys.executable, os.path.join(REPO, "bin", "validate_metadata.py"),
+           "--meta_path", sheet, "--batch_size", "2",
+           "--custom_fields_file", os.path.join(REPO, "assets", "custom_meta_fields", "example_custom_fields.json"),
+           "--config_file", os.path.join(REPO, "conf", "submission_config.yaml"),
+           "--biosample_fields_key", os.path.join(REPO, "assets", "biosample_fields_key.yaml")] + extra_args
+    subprocess.run(cmd, cwd=outdir, check=True, stdout=subprocess.DEVNULL)
+    return outdir
+
+
+def compare_outputs(name, expected_dir, actual_dir):
+    """ Asserts that two validation runs wrote the same batch TSVs and error report """
+    batches = [os.path.join(run_dir, "batched_tsvs") for run_dir in (expected_dir, actual_dir)]
+    names = [sorted(name for name in os.listdir(batch_dir) if name.endswith((".tsv", ".json"))) for batch_dir in batches]
+    failures = [] if names[0] == names[1] else ["batched_tsvs: different files"]
+    names = names[0]
+    _, mismatch, errors = filecmp.cmpfiles(*batches, names, shallow=False)
+    failures.extend(f"batched_tsvs/{file}" for file in mismatch + errors)
+    if not filecmp.cmp(os.path.join(expected_dir, "error.txt"), os.path.join(actual_dir, "error.txt"), shallow=False):
+        failures.append("error.txt")
+    assert not failures, f"{name}: outputs differ: {', '.join(failures[:10])}"
+    print(f"{name}: outputs match")
+
+
+def check_regex_rule():
+    """ RegexRule fails values that do not fully match, missing values and rows of a missing column;
+        if_present limits it to rows where those columns are filled, and fill_value rewrites the failures
+    """
+    df = pd.DataFrame({"sample_name": ["a", "b", "c", "d"],
+                       "ncbi-spuid": ["SP_1", "SP_1x", None, "SP_22"],
+                       "fasta_path": ["a.fasta", "b.fasta", "c.fasta", ""]}, dtype=object)
+    rule = RegexRule("ncbi-spuid", r"SP_\d+", "ERROR: {field} '{value}' is not an SPUID", if_present=["fasta_path"])
+    log = {sample: [] for sample in df["sample_name"]}
+    mask, = RuleEngine([rule]).run(df, log)
+    assert mask.tolist() == [False, True, True, False], mask.tolist()
+    assert log["b"] == ["ERROR: ncbi-spuid 'SP_1x' is not an SPUID"] and log["c"] and not log["a"] and not log["d"], log
+    assert RegexRule("missing_column", r".*", "").evaluate(df).all()
+
+    filled = RegexRule("ncbi-spuid", r"SP_\d+", "INFO: replaced {field}", fill_value="Not Provided")
+    RuleEngine([filled]).run(df, {sample: [] for sample in df["sample_name"]})
+    assert df["ncbi-spuid"].tolist() == ["SP_1", "Not Provided", "Not Provided", "SP_22"], df["ncbi-spuid"].tolist()
+    print("RegexRule: behaves as expected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that validation outputs do not depend on how rows are processed")
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--workdir", help="Directory for the sheet and the outputs (default: a temporary one)")
+    args = parser.parse_args()
+
+    check_regex_rule()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="validation_consistency_")
+    os.makedirs(workdir, exist_ok=True)
+    sheet = os.path.join(workdir, "metadata.xlsx")
+    write_sheet(sheet, args.rows)
+
+    serial = run_validation(sheet, os.path.join(workdir, "workers_1"), ["--workers", "1"])
+    sharded = run_validation(sheet, os.path.join(workdir, f"workers_{args.workers}"), ["--workers", str(args.workers)])
+    compare_outputs(f"--workers 1 vs --workers {args.workers}", serial, sharded)
+
+    cache = ["--workers", "1", "--metadata_cache_dir", os.path.join(workdir, "metadata_cache")]
+    shutil.rmtree(cache[-1], ignore_errors=True)
+    run_validation(sheet, os.path.join(workdir, "cache_cold"), cache)
+    warm = run_validation(sheet, os.path.join(workdir, "cache_warm"), cache)
+    compare_outputs("parsed vs cached sheet", serial, warm)
+
+    changed = os.path.join(workdir, "metadata_changed.xlsx")
+    write_sheet(changed, args.rows, illumina_rows={args.rows // 4})
+    workers = ["--workers", str(args.workers)]
+    full = run_validation(changed, os.path.join(workdir, "full"), workers)
+    incremental = run_validation(changed, os.path.join(workdir, "incremental"), workers + ["--previous_validation_dir", sharded])
+    compare_outputs("incremental vs full run", full, incremental)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,11 +32,15 @@ workflow BIOSAMPLE_AND_SRA {
 	// Print summary of supplied parameters
 	log.info paramsSummaryLog(workflow)
 
+	// Published outputs of the previous validation, staged for --incremental_validation ([] when there are none)
+	previous_validation = file("${params.outdir}/${params.metadata_basename}/${params.validation_outdir}")
+	previous_validation_dir = params.incremental_validation && previous_validation.exists() ? previous_validation : []
+
 	// Run metadata validation process
-	METADATA_VALIDATION ( file(params.meta_path) )
+	METADATA_VALIDATION ( file(params.meta_path), previous_validation_dir )
 
 	// Enforce error checking before anything else continues
-    CHECK_VALIDATION_ERRORS(METADATA_VALIDATION.out.errors)
+    CHECK_VALIDATION_ERRORS(METADATA_VALIDATION.out.report)
 
     // Get status from the check
 	CHECK_VALIDATION_ERRORS.out.status.subscribe { status ->